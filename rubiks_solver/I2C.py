@@ -21,8 +21,8 @@
 # THE SOFTWARE.
 import logging
 import subprocess
-
-import smbus
+import time
+import weakref
 
 import Platform 
 
@@ -84,17 +84,153 @@ def require_repeated_start():
     # behavior and send repeated starts.
 
 
+# Upper bounds in microseconds of the buckets of the latency histograms.
+LATENCY_BUCKETS = (50, 100, 200, 500, 1000, 2000, 5000, 10000, float('inf'))
+
+# The devices that got created, so that they can be instrumented later on.
+_devices = weakref.WeakSet()
+_instrumentation = None
+
+
+class Instrumentation(object):
+    """Counts the transactions of the instrumented devices for each device and
+    register and keeps a histogram of their latencies for each device."""
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        """Clear all counters, like at the start of a run."""
+        self.counts = {}
+        self.histograms = {}
+        self.seconds = {}
+
+    def record(self, address, register, seconds):
+        """Record a transaction of a device on a register (None for the ones
+        without a register) that took the given number of seconds."""
+        key = (address, register)
+        self.counts[key] = self.counts.get(key, 0) + 1
+        histogram = self.histograms.get(address)
+        if histogram is None:
+            histogram = self.histograms[address] = [0] * len(LATENCY_BUCKETS)
+            self.seconds[address] = 0.0
+        micros = seconds * 1e6
+        for idx, bound in enumerate(LATENCY_BUCKETS):
+            if micros <= bound:
+                histogram[idx] += 1
+                break
+        self.seconds[address] += seconds
+
+    def summary(self):
+        """Return the lines of a summary of the counters: the transactions and
+        the time spent on the bus for each device, its busiest registers and its
+        latency histogram."""
+        lines = []
+        for address in sorted(self.histograms):
+            transactions = sum(self.histograms[address])
+            lines.append('device {0:#04x}: {1} transactions in {2:.3f} seconds'.format(
+                address, transactions, self.seconds[address]))
+            registers = sorted(((count, register) for (device, register), count in self.counts.items()
+                                if device == address), key=lambda item: -item[0])
+            lines.append('  registers: ' + ', '.join(
+                '{0}={1}'.format('raw' if register is None else '{0:#04x}'.format(register), count)
+                for count, register in registers[:8]))
+            lines.append('  latency: ' + ', '.join(
+                '<={0:g}us: {1}'.format(bound, count) for bound, count in zip(LATENCY_BUCKETS, self.histograms[address])
+                if count > 0))
+        return lines
+
+
+class InstrumentedBus(object):
+    """Wraps an smbus.SMBus compatible bus and records how long each of its
+    transactions takes."""
+    def __init__(self, bus, instrumentation):
+        self.bus = bus
+        self.instrumentation = instrumentation
+
+    def __call(self, method, address, register, *args):
+        start = time.perf_counter()
+        try:
+            return method(address, *args)
+        finally:
+            self.instrumentation.record(address, register, time.perf_counter() - start)
+
+    def write_byte(self, addr, val):
+        return self.__call(self.bus.write_byte, addr, None, val)
+
+    def write_byte_data(self, addr, cmd, val):
+        return self.__call(self.bus.write_byte_data, addr, cmd, cmd, val)
+
+    def write_word_data(self, addr, cmd, val):
+        return self.__call(self.bus.write_word_data, addr, cmd, cmd, val)
+
+    def write_i2c_block_data(self, addr, cmd, vals):
+        return self.__call(self.bus.write_i2c_block_data, addr, cmd, cmd, vals)
+
+    def read_byte(self, addr):
+        return self.__call(self.bus.read_byte, addr, None)
+
+    def read_byte_data(self, addr, cmd):
+        return self.__call(self.bus.read_byte_data, addr, cmd, cmd)
+
+    def read_word_data(self, addr, cmd):
+        return self.__call(self.bus.read_word_data, addr, cmd, cmd)
+
+    def read_i2c_block_data(self, addr, cmd, length=32):
+        return self.__call(self.bus.read_i2c_block_data, addr, cmd, cmd, length)
+
+    def __getattr__(self, name):
+        return getattr(self.bus, name)
+
+
+def enable_instrumentation():
+    """Start recording the transactions of all devices, the existing ones and
+    the ones created from now on.  The devices' buses get wrapped, so there's
+    no cost at all while it's disabled.  Returns the Instrumentation object."""
+    global _instrumentation
+    if _instrumentation is None:
+        _instrumentation = Instrumentation()
+        for device in _devices:
+            device._instrument(_instrumentation)
+    return _instrumentation
+
+def disable_instrumentation():
+    """Stop recording the transactions of all devices."""
+    global _instrumentation
+    _instrumentation = None
+    for device in _devices:
+        device._instrument(None)
+
+def get_instrumentation():
+    """Return the Instrumentation object or None if it's disabled."""
+    return _instrumentation
+
+
 class Device(object):
     """Class for communicating with an I2C device using the smbus library.
     Allows reading and writing 8-bit, 16-bit, and byte array values to registers
     on the device."""
-    def __init__(self, address, busnum):
+    def __init__(self, address, busnum, i2c_interface=None):
         """Create an instance of the I2C device at the specified address on the
-        specified I2C bus number."""
+        specified I2C bus number.  The bus is opened with smbus.SMBus unless
+        another class with the same interface is given as i2c_interface."""
         self._address = address
-        self._bus = smbus.SMBus(busnum)
+        if i2c_interface is None:
+            import smbus
+            i2c_interface = smbus.SMBus
+        self._bus = i2c_interface(busnum)
         self._logger = logging.getLogger('Adafruit_I2C.Device.Bus.{0}.Address.{1:#0X}' \
                                 .format(busnum, address))
+        _devices.add(self)
+        if _instrumentation is not None:
+            self._instrument(_instrumentation)
+
+    def _instrument(self, instrumentation):
+        """Wrap the bus so that its transactions get recorded, or unwrap it when
+        instrumentation is None."""
+        if isinstance(self._bus, InstrumentedBus):
+            self._bus = self._bus.bus
+        if instrumentation is not None:
+            self._bus = InstrumentedBus(self._bus, instrumentation)
 
     def writeRaw8(self, value):
         """Write an 8-bit value on the bus (without register)."""
@@ -43,11 +43,17 @@ ALL_LED_OFF_H      = 0xFD
 
 # Bits:
 RESTART            = 0x80
+AI                 = 0x20
 SLEEP              = 0x10
 ALLCALL            = 0x01
 INVRT              = 0x10
+OCH                = 0x08
+FULL               = 0x10  # Full ON/OFF bit of the LEDn_ON_H/LEDn_OFF_H registers.
 OUTDRV             = 0x04
 
+# Most bytes an SMBus block write can carry.
+BLOCK_SIZE         = 32
+
 
 logger = logging.getLogger(__name__)
 
@@ -72,9 +78,15 @@ class PCA9685(object):
             import I2C as I2C
             i2c = I2C
         self._device = i2c.get_i2c_device(address, **kwargs)
+        # Shadow copy of the PWM registers of the 16 channels, None where not known yet.
+        self._shadow = [None] * 64
+        self.reset_counters()
+        self._device.write8(MODE1, ALLCALL | AI) # Auto-increment so that block writes fill consecutive registers.
         self.set_all_pwm(0, 0)
-        self._device.write8(MODE2, (OUTDRV | INVRT)) # Totem pole drive, and inverted signal.
-        self._device.write8(MODE1, ALLCALL)
+        # Totem pole drive, and inverted signal.  OCH is left cleared so that the outputs
+        # only change on the STOP of a transaction, which makes block writes atomic.
+        self._device.write8(MODE2, (OUTDRV | INVRT))
+        self._device.write8(MODE1, ALLCALL | AI)
         time.sleep(0.005)  # wait for oscillator
         mode1 = self._device.readU8(MODE1)
         mode1 = mode1 & ~SLEEP  # wake up (reset sleep)
@@ -100,15 +112,81 @@ class PCA9685(object):
         self._device.write8(MODE1, oldmode | 0x80)
 
     def set_pwm(self, channel, on, off):
-        """Sets a single PWM channel."""
-        self._device.write8(LED0_ON_L+4*channel, on & 0xFF)
-        self._device.write8(LED0_ON_H+4*channel, on >> 8)
-        self._device.write8(LED0_OFF_L+4*channel, off & 0xFF)
-        self._device.write8(LED0_OFF_H+4*channel, off >> 8)
+        """Sets a single PWM channel in a single block write."""
+        self._write_pwm(LED0_ON_L+4*channel, [on & 0xFF, on >> 8, off & 0xFF, off >> 8])
+
+    def set_pwm_registers(self, register, data):
+        """Writes the already resolved ON_L, ON_H, OFF_L and OFF_H bytes of one or
+        more consecutive PWM channels in a single block write, which the PCA9685
+        applies on its STOP condition, so the outputs change together.  The bytes
+        that are None keep what their registers hold: they get their last written
+        values back and are only read when they haven't been written yet.  Returns
+        whether anything had to be written."""
+        data = list(data)
+        if None in data:
+            offset = register-LED0_ON_L
+            held = self._shadow[offset:offset+len(data)]
+            if any(new is None and old is None for new, old in zip(data, held)):
+                held = []
+                for start in range(0, len(data), BLOCK_SIZE):
+                    held += self._device.readList(register+start, min(BLOCK_SIZE, len(data)-start))
+            data = [old if new is None else new for new, old in zip(data, held)]
+        return self._write_pwm(register, data)
+
+    def set_pwm_channels(self, channel, values):
+        """Sets consecutive PWM channels starting with the given one.  The values
+        are a list of (on, off) tuples, one for each channel, and they're sent in
+        as few block writes as possible."""
+        data = []
+        for on, off in values:
+            data += [on & 0xFF, on >> 8, off & 0xFF, off >> 8]
+        self._write_pwm(LED0_ON_L+4*channel, data)
 
     def set_all_pwm(self, on, off):
-        """Sets all PWM channels."""
-        self._device.write8(ALL_LED_ON_L, on & 0xFF)
-        self._device.write8(ALL_LED_ON_H, on >> 8)
-        self._device.write8(ALL_LED_OFF_L, off & 0xFF)
-        self._device.write8(ALL_LED_OFF_H, off >> 8)
+        """Sets all PWM channels.  Returns whether anything had to be written."""
+        data = [on & 0xFF, on >> 8, off & 0xFF, off >> 8]
+        if self._shadow == data * 16:
+            self.skipped_writes += 1
+            return False
+        self._device.writeList(ALL_LED_ON_L, data)
+        self.writes += 1
+        self._shadow = data * 16
+        return True
+
+    def set_all_full_on(self):
+        """Sets the full ON bit of all channels with a single byte written to the
+        ALL_LED_ON_H register, which is the quickest way to reach all outputs.
+        With the inverted outputs of the PivotPi that's what stops the pulses,
+        so the servos get released.  The other registers are left as they are."""
+        self._device.write8(ALL_LED_ON_H, FULL)
+        self.writes += 1
+        for channel in range(16):
+            self._shadow[4*channel+1] = FULL
+
+    def reset_counters(self):
+        """Sets the counters of written and skipped writes back to 0."""
+        self.writes = 0
+        self.skipped_writes = 0
+
+    def _write_pwm(self, register, data):
+        """Block writes bytes to the PWM registers.  A shadow copy of what was last
+        written to each channel is kept, so the channels at either end that
+        already hold their bytes are left out and nothing gets written if all
+        of them do.  Returns whether anything had to be written."""
+        first = register-LED0_ON_L
+        last = first+len(data)
+        data = list(data)
+        while first < last and self._shadow[first:first+4] == data[:4]:
+            first += 4
+            data = data[4:]
+        while first < last and self._shadow[last-4:last] == data[-4:]:
+            last -= 4
+            data = data[:-4]
+        if not data:
+            self.skipped_writes += 1
+            return False
+        for start in range(0, len(data), BLOCK_SIZE):
+            self._device.writeList(LED0_ON_L+first+start, data[start:start+BLOCK_SIZE])
+            self.writes += 1
+        self._shadow[first:last] = data
+        return True
@@ -1,4 +1,7 @@
 import logging
+import copy
+import heapq
+import cube
 from aenum import Enum, auto
 
 logger = logging.getLogger(__name__)
@@ -21,11 +24,62 @@ class State(Enum):
     TURN = auto()
     DOUBLE_TURN = auto()
 
+# the degrees of freedom indexed by the number of quarter turns
+TURNS = [State.NO_TURN, State.TURN, State.DOUBLE_TURN]
+
+class Opcode(Enum):
+
+    SERVO = auto()
+    PHOTO = auto()
+
+class Step:
+    __slots__ = ('opcode', 'servo', 'channel', 'linear', 'position', 'time')
+
+    def __init__(self, opcode, servo=None, linear=False, position=None, time=0.0):
+        """
+        Create a step of the arms' solution.
+
+        :param opcode: SERVO to move a servo or PHOTO to take a photo of the cube.
+        :param servo: Name of the servo to move (like 's1'), the servos being numbered from 1.
+        :param linear: True if it's the linear servo of an arm, False if it's the rotational one.
+        :param position: The position of the servo in degrees.
+        :param time: The amount of time in seconds to wait after issuing the step.
+        """
+        self.opcode = opcode
+        self.servo = servo
+        self.linear = linear
+        self.position = position
+        self.time = time
+
+        # resolved here so that the servo's name doesn't have to be parsed when the step gets compiled
+        if servo is not None:
+            self.channel = int(servo[1:]) - 1
+        else:
+            self.channel = None
+
+    @property
+    def rotational(self):
+        return self.opcode == Opcode.SERVO and not self.linear
+
+    def copy(self, time):
+        """
+        Copies the step with a different delay.
+
+        :param time: The amount of time in seconds to wait after issuing the new step.
+        :return: The new step.
+        """
+        return Step(self.opcode, self.servo, self.linear, self.position, time)
+
+    def __repr__(self):
+        if self.opcode == Opcode.SERVO:
+            return 'Step({}, {}, position={}, time={:.3f})'.format(self.opcode.name, self.servo, self.position, self.time)
+        return 'Step({}, time={:.3f})'.format(self.opcode.name, self.time)
+
 class Arm:
     def __init__(self, linear_servo, rotational_servo,
                  linear_low, linear_high, rotation_low, rotation_high,
                  current_linear, current_rotational,
-                 rotation_speed, command_delay):
+                 rotation_speed, command_delay, rotation_double=None):
         """
         Create an object to represent an arm of the rubik's solver cube.
 
@@ -39,6 +93,8 @@ class Arm:
         :param current_rotational: The current position of the rotational servo.
         :param rotation_speed: The speed of rotation of a servo in seconds/degree.
         :param command_delay: The amount of delay to add between commands as measured in seconds.
+        :param rotation_double: The position of the rotational servo that's another quarter turn past the high
+            position, for servos with enough travel to do half turns. None if the servo can't get there.
         """
         self.linear_servo = linear_servo
         self.rotational_servo = rotational_servo
@@ -47,6 +103,12 @@ class Arm:
         self.linear_high = linear_high
         self.rotation_low = rotation_low
         self.rotation_high = rotation_high
+        self.rotation_double = rotation_double
+
+        # the rotational positions in the order they're reached by rotating clockwise
+        self.rotations = [rotation_low, rotation_high]
+        if rotation_double is not None:
+            self.rotations.append(rotation_double)
 
         self.current_linear = current_linear
         self.current_rotational = current_rotational
@@ -55,7 +117,7 @@ class Arm:
         self.command_delay = command_delay
 
         if (self.current_linear != self.linear_low and self.current_linear != self.linear_high) or \
-            (self.current_rotational != self.rotation_low and self.current_rotational != self.rotation_high):
+            self.current_rotational not in self.rotations:
             raise RuntimeError('the current values of the servos don\'t match the permitted high/low vals')
 
     def check_position(self, axis):
@@ -92,8 +154,8 @@ class Arm:
 
         :param axis: Can be LINEAR or ROTATIONAL.
         :param way: Can be FORWARD/BACK for LINEAR or CLOCKWISE/ANTICLOCKWISE for ROTATIONAL.
-        :return: The amount of turns that can be done in the given way: NO_TURN or TURN.
-            ERROR is returned is the axis argument is bad.
+        :return: The amount of turns that can be done in the given way: NO_TURN or TURN, or DOUBLE_TURN
+            for the rotational servo if it has a double position. ERROR is returned is the axis argument is bad.
         """
         dof = State.ERROR
         if axis == State.LINEAR:
@@ -112,44 +174,40 @@ class Arm:
 
         elif axis == State.ROTATIONAL:
 
+            position = self.rotations.index(self.current_rotational)
             if way == State.CLOCKWISE:
-                if self.current_rotational == self.rotation_low:
-                    dof = State.TURN
-                elif self.current_rotational == self.rotation_high:
-                    dof = State.NO_TURN
-
+                dof = TURNS[len(self.rotations) - 1 - position]
             elif way == State.ANTICLOCKWISE:
-                if self.current_rotational == self.rotation_low:
-                    dof = State.NO_TURN
-                elif self.current_rotational == self.rotation_high:
-                    dof = State.TURN
+                dof = TURNS[position]
 
         return dof
 
-    def rotate(self, way, add_servo_delay=True, add_command_delay=True):
+    def rotate(self, way, add_servo_delay=True, add_command_delay=True, turns=State.TURN):
         """
         Rotate the arm's servo that's designated for rotating the cube.
 
         :param way: CLOCKWISE or ANTICLOCKWISE.
         :param add_servo_delay: True if it must be waited for the servo's command to finish. False otherwise.
         :param add_command_delay:  True if a delay is to be put between commands. False otherwise.
-        :return: A dictionary with the 'servo', 'linear', 'rotational', 'position', 'time' keys that
-            specify which servo to rotate, whether it's a rotational servo of the arm or not, what's the
-            new position of the servo and the amount of time needed to execute the command. None is returned
-            if the action is not accepted.
+        :param turns: TURN or DOUBLE_TURN. Use check_dof method to see if that's possible.
+        :return: A Step that specifies which servo to move, whether it's the linear servo of the arm or not,
+            what's the new position of the servo and the amount of time needed to execute the command. None
+            is returned if the action is not accepted.
         """
 
-        turns = self.check_dof(State.ROTATIONAL, way)
+        dof = self.check_dof(State.ROTATIONAL, way)
         done = False
         time = 0.0
 
-        if turns == State.TURN:
+        if dof in TURNS and turns in TURNS and TURNS.index(dof) >= TURNS.index(turns) > 0:
 
-            time += abs(self.rotation_low - self.rotation_high) * self.rotation_speed
-            if self.current_rotational == self.rotation_low:
-                self.current_rotational = self.rotation_high
-            elif self.current_rotational == self.rotation_high:
-                self.current_rotational = self.rotation_low
+            position = self.rotations.index(self.current_rotational)
+            if way == State.CLOCKWISE:
+                position += TURNS.index(turns)
+            else:
+                position -= TURNS.index(turns)
+            time += abs(self.rotations[position] - self.current_rotational) * self.rotation_speed
+            self.current_rotational = self.rotations[position]
             done = True
 
         if done:
@@ -157,13 +215,7 @@ class Arm:
                 time = 0.0
             if add_command_delay:
                 time += self.command_delay
-            step = {
-                'servo': self.rotational_servo,
-                'linear': False,
-                'rotational': True,
-                'position': self.current_rotational,
-                'time': time
-            }
+            step = Step(Opcode.SERVO, self.rotational_servo, False, self.current_rotational, time)
 
             return step
         else:
@@ -178,10 +230,9 @@ class Arm:
         :param position: Position of the arm to move to. Can be BACK or FORWARD. Use check_dof method to see if that's possible.
         :param add_servo_delay: True if a delay is to be put between commands. False otherwise.
         :param add_command_delay: True if it must be waited for the servo's command to finish. False otherwise.
-        :return: A dictionary with the 'servo', 'linear', 'rotational', 'position', 'time' keys that
-            specify which servo to rotate, whether it's a rotational servo of the arm or not, what's the
-            new position of the servo and the amount of time needed to execute the command. None is returned
-            if the action is not accepted.
+        :return: A Step that specifies which servo to move, whether it's the linear servo of the arm or not,
+            what's the new position of the servo and the amount of time needed to execute the command. None
+            is returned if the action is not accepted.
         """
 
         turns = self.check_dof(State.LINEAR, position)
@@ -202,13 +253,7 @@ class Arm:
                 time = 0.0
             if add_command_delay:
                 time += self.command_delay
-            step = {
-                'servo': self.linear_servo,
-                'linear': True,
-                'rotational': False,
-                'position': self.current_linear,
-                'time': time
-            }
+            step = Step(Opcode.SERVO, self.linear_servo, True, self.current_linear, time)
 
             return step
         else:
@@ -219,17 +264,10 @@ class Arm:
         Forces to record the repositioning of the linear servo even though it
         may be in that position already.
         :param delay: Time in seconds to wait for this command to execute.
-        :return: A dictionary with the 'servo', 'linear', 'rotational', 'position', 'time' keys that
-            specify which servo to rotate, whether it's a rotational servo of the arm or not, what's the
-            new position of the servo and the amount of time needed to execute the command.
-        """
-        step = {
-            'servo': self.linear_servo,
-            'linear': True,
-            'rotational': False,
-            'position': self.current_linear,
-            'time': delay
-        }
+        :return: A Step that specifies which servo to move, whether it's the linear servo of the arm or not,
+            what's the new position of the servo and the amount of time needed to execute the command.
+        """
+        step = Step(Opcode.SERVO, self.linear_servo, True, self.current_linear, delay)
         return step
 
     def reposition_rotational(self, delay=0.0):
@@ -237,25 +275,79 @@ class Arm:
         Forces to record the repositioning of the rotational servo even though it
         may be in that position already.
         :param delay: Time in seconds to wait for this command to execute.
-        :return: A dictionary with the 'servo', 'linear', 'rotational', 'position', 'time' keys that
-            specify which servo to rotate, whether it's a rotational servo of the arm or not, what's the
-            new position of the servo and the amount of time needed to execute the command.
-        """
-        step = {
-            'servo': self.rotational_servo,
-            'linear': False,
-            'rotational': True,
-            'position': self.current_rotational,
-            'time': delay
-        }
+        :return: A Step that specifies which servo to move, whether it's the linear servo of the arm or not,
+            what's the new position of the servo and the amount of time needed to execute the command.
+        """
+        step = Step(Opcode.SERVO, self.rotational_servo, False, self.current_rotational, delay)
         return step
 
+def instantiate_arms(config, mode, rotation_speed=0.004, command_delay=0.05):
+    """
+    Initialize the robot's arms either in released or fixed mode.
+
+    :param config: The configuration dictionary as it comes from the GUI app. A rotational servo that has
+        enough travel for half turns can have a 'double' position next to its 'low' and 'high' ones.
+    :param mode: 'fix' or 'release'.
+    :param rotation_speed: The speed of rotation of a servo in seconds/degree.
+    :param command_delay: The amount of delay to add between commands as measured in seconds.
+    :return: A list of 4 elements with instances of the Arm class: the down, left, up and right arms.
+        None is returned if the mode is bad. ValueError is raised if a 'double' position isn't a servo's angle.
+    """
+    robot_arms = []
+    servos = config['servos']
+
+    if mode == 'fix':
+        pos = 'low'
+    elif mode == 'release':
+        pos = 'high'
+    else:
+        return None
+
+    keys = list(servos.keys())
+    keys.sort()
+
+    # because there are 4 arms
+    for i in range(4):
+        linear_servo = keys[2 * i]
+        rotational_servo = keys[2 * i + 1]
+        linear_cfg = servos[linear_servo]
+        rotational_cfg = servos[rotational_servo]
+        double = rotational_cfg.get('double')
+        # the position would only be found to be bad once the arms' solution got compiled
+        if double is not None and not 0 <= double <= 180:
+            raise ValueError('the double position of servo {} is {}, but it has to be within 0-180 degrees'.format(
+                rotational_servo, double))
+        robot_arms.append(
+            Arm(linear_servo, rotational_servo,
+                linear_cfg['low'], linear_cfg['high'],
+                rotational_cfg['low'], rotational_cfg['high'],
+                linear_cfg[pos], rotational_cfg['low'],
+                rotation_speed=rotation_speed, command_delay=command_delay,
+                rotation_double=double)
+        )
+
+    return robot_arms
+
 class ArmSolutionGenerator:
-    def __init__(self, down, left, up, right):
+    def __init__(self, down, left, up, right, lazy_regrip=False):
         self.up = up
         self.right = right
         self.down = down
         self.left = left
+
+        # map each servo to the arm it belongs to
+        self.arms = [self.down, self.left, self.up, self.right]
+        self.servos = {}
+        for arm in self.arms:
+            self.servos[arm.linear_servo] = arm
+            self.servos[arm.rotational_servo] = arm
+
+        # whether the arms are left rotated after turning a face and only regripped when they can't turn anymore
+        self.lazy_regrip = lazy_regrip
+
+        # estimated times of the moves/reorientations for each position of the arms
+        self.planning_costs = {}
+
         self.reset_arm_solution()
 
     def fix(self):
@@ -299,6 +391,12 @@ class ArmSolutionGenerator:
     def reset_arm_solution(self):
         self.arms_solution = []
 
+        # remember where the arms were when the solution started
+        # so that it can be replayed/analyzed from the beginning
+        self.initial_positions = {}
+        for arm in self.arms:
+            self.initial_positions[arm] = (arm.current_linear, arm.current_rotational)
+
     def __inverse_way(self, way):
         if way == State.CLOCKWISE:
             return State.ANTICLOCKWISE
@@ -330,50 +428,127 @@ class ArmSolutionGenerator:
         elif face == 'B':
             self.rotate_back(turns, way)
 
+    def regrip(self, arm, way, turns=State.TURN):
+        """
+        Regrips the cube with an arm if the arm can't rotate as far as needed in the given way.
+        The arm gets retracted, rotated back just enough and engaged again.
+
+        :param arm: The arm that has to be able to rotate.
+        :param way: CLOCKWISE or ANTICLOCKWISE.
+        :param turns: TURN or DOUBLE_TURN.
+        :return: Nothing.
+        """
+        missing = TURNS.index(turns) - TURNS.index(arm.check_dof(State.ROTATIONAL, way))
+        if missing > 0:
+            self.arms_solution += [
+                    arm.move(State.BACK),
+                    arm.rotate(self.__inverse_way(way), turns=TURNS[missing]),
+                    arm.move(State.FORWARD)
+                ]
+
+    def __rotate_back(self, arm, rotation):
+        """
+        Brings the rotational servo of an arm back to a position while the arm is retracted.
+
+        :param arm: The arm to rotate back.
+        :param rotation: The position of the rotational servo to get to.
+        :return: Nothing.
+        """
+        quarters = arm.rotations.index(rotation) - arm.rotations.index(arm.current_rotational)
+        if quarters != 0:
+            way = State.CLOCKWISE if quarters > 0 else State.ANTICLOCKWISE
+            self.arms_solution += [
+                    arm.move(State.BACK),
+                    arm.rotate(way, turns=TURNS[abs(quarters)]),
+                    arm.move(State.FORWARD)
+                ]
+
+    def __lazy_rotate(self, arm, turns, way, turn):
+        """
+        Turns a face without bringing the arm back to its initial rotation afterwards.
+        The arm only gets regripped when it can't turn in the needed way. A double turn goes
+        whichever way the arm can go at first, so that it only needs a single regrip. Arms that
+        have a double position do a double turn in a single rotation.
+
+        :param arm: The arm that turns the face.
+        :param turns: TURN or DOUBLE_TURN.
+        :param way: CLOCKWISE or ANTICLOCKWISE.
+        :param turn: Function that gets called with the way and the turns to do once the arm can rotate.
+        :return: Nothing.
+        """
+        if turns == State.DOUBLE_TURN:
+            if arm.check_dof(State.ROTATIONAL, way) == State.NO_TURN or \
+                    arm.check_dof(State.ROTATIONAL, self.__inverse_way(way)) == State.DOUBLE_TURN:
+                way = self.__inverse_way(way)
+
+            if arm.rotation_double is None:
+                self.regrip(arm, way)
+                turn(way, State.TURN)
+                self.regrip(arm, way)
+                turn(way, State.TURN)
+                return
+
+        self.regrip(arm, way, turns)
+        turn(way, turns)
+
     def rotate_up(self, turns, way):
         self.arms_solution += [self.down.move(State.FORWARD)]
 
-        if turns == State.TURN:
+        if self.lazy_regrip:
+            self.__lazy_rotate(self.up, turns, way,
+                               lambda way, turns: self.append_command(self.up.rotate(way, turns=turns)))
+            return
+
+        if turns == State.TURN or self.up.rotation_double is not None:
             if way == State.CLOCKWISE:
                 self.arms_solution += [
-                        self.up.rotate(way),
+                        self.up.rotate(way, turns=turns),
                         self.up.move(State.BACK),
-                        self.up.rotate(self.__inverse_way(way)),
+                        self.up.rotate(self.__inverse_way(way), turns=turns),
                         self.up.move(State.FORWARD)
                     ]
             elif way == State.ANTICLOCKWISE:
                 self.arms_solution += [
                         self.up.move(State.BACK),
-                        self.up.rotate(self.__inverse_way(way)),
+                        self.up.rotate(self.__inverse_way(way), turns=turns),
                         self.up.move(State.FORWARD),
-                        self.up.rotate(way)
+                        self.up.rotate(way, turns=turns)
                     ]
         elif turns == State.DOUBLE_TURN:
             self.rotate_up(State.TURN, way)
             self.rotate_up(State.TURN, way)
 
     def rotate_right(self, turns, way):
-        if turns == State.TURN:
+        if self.lazy_regrip:
+            self.__lazy_rotate(self.right, turns, way,
+                               lambda way, turns: self.append_command(self.right.rotate(way, turns=turns)))
+            return
+
+        if turns == State.TURN or self.right.rotation_double is not None:
             if way == State.CLOCKWISE:
                 self.arms_solution += [
-                        self.right.rotate(way),
+                        self.right.rotate(way, turns=turns),
                         self.right.move(State.BACK),
-                        self.right.rotate(self.__inverse_way(way)),
+                        self.right.rotate(self.__inverse_way(way), turns=turns),
                         self.right.move(State.FORWARD)
                     ]
             elif way == State.ANTICLOCKWISE:
                 self.arms_solution += [
                         self.right.move(State.BACK),
-                        self.right.rotate(self.__inverse_way(way)),
+                        self.right.rotate(self.__inverse_way(way), turns=turns),
                         self.right.move(State.FORWARD),
-                        self.right.rotate(way)
+                        self.right.rotate(way, turns=turns)
                     ]
         elif turns == State.DOUBLE_TURN:
             self.rotate_right(State.TURN, way)
             self.rotate_right(State.TURN, way)
 
     def rotate_down(self, turns, way):
-        if turns == State.TURN:
+        if self.lazy_regrip:
+            self.__lazy_rotate(self.down, turns, way, self.__turn_down_layer)
+            return
+
+        if turns == State.TURN or self.down.rotation_double is not None:
             if way == State.CLOCKWISE:
                 self.arms_solution += [
                         self.right.move(State.BACK, False, False),
@@ -383,7 +558,7 @@ class ArmSolutionGenerator:
                         self.right.move(State.FORWARD, False, False),
                         self.left.move(State.FORWARD),
 
-                        self.down.rotate(way, turns),
+                        self.down.rotate(way, turns=turns),
                         self.right.move(State.BACK, False, False),
                         self.left.move(State.BACK),
                         self.down.move(State.FORWARD),
@@ -392,13 +567,13 @@ class ArmSolutionGenerator:
                         self.left.move(State.FORWARD),
 
                         self.down.move(State.BACK),
-                        self.down.rotate(self.__inverse_way(way)),
+                        self.down.rotate(self.__inverse_way(way), turns=turns),
                         self.down.move(State.FORWARD)
                     ]
             elif way == State.ANTICLOCKWISE:
                 self.arms_solution += [
                         self.down.move(State.BACK),
-                        self.down.rotate(self.__inverse_way(way)),
+                        self.down.rotate(self.__inverse_way(way), turns=turns),
                         self.down.move(State.FORWARD),
 
                         self.right.move(State.BACK, False, False),
@@ -408,7 +583,7 @@ class ArmSolutionGenerator:
                         self.right.move(State.FORWARD, False, False),
                         self.left.move(State.FORWARD),
 
-                        self.down.rotate(way),
+                        self.down.rotate(way, turns=turns),
                         self.right.move(State.BACK, False, False),
                         self.left.move(State.BACK),
                         self.down.move(State.FORWARD),
@@ -420,27 +595,73 @@ class ArmSolutionGenerator:
             self.rotate_down(State.TURN, way)
             self.rotate_down(State.TURN, way)
 
+    def __turn_down_layer(self, way, turns):
+        """
+        Turns the down layer: the cube gets lowered onto the retracted down arm, gripped by
+        the left/right arms, turned by the down arm and then raised back.
+
+        :param way: CLOCKWISE or ANTICLOCKWISE.
+        :param turns: TURN or DOUBLE_TURN.
+        :return: Nothing.
+        """
+        self.arms_solution += [
+                self.right.move(State.BACK, False, False),
+                self.left.move(State.BACK),
+
+                self.down.move(State.BACK),
+                self.right.move(State.FORWARD, False, False),
+                self.left.move(State.FORWARD),
+
+                self.down.rotate(way, turns=turns),
+                self.right.move(State.BACK, False, False),
+                self.left.move(State.BACK),
+                self.down.move(State.FORWARD),
+
+                self.right.move(State.FORWARD, False, False),
+                self.left.move(State.FORWARD)
+            ]
+
     def rotate_left(self, turns, way):
-        if turns == State.TURN:
+        if self.lazy_regrip:
+            self.__lazy_rotate(self.left, turns, way,
+                               lambda way, turns: self.append_command(self.left.rotate(way, turns=turns)))
+            return
+
+        if turns == State.TURN or self.left.rotation_double is not None:
             if way == State.CLOCKWISE:
                 self.arms_solution += [
-                        self.left.rotate(way),
+                        self.left.rotate(way, turns=turns),
                         self.left.move(State.BACK),
-                        self.left.rotate(self.__inverse_way(way)),
+                        self.left.rotate(self.__inverse_way(way), turns=turns),
                         self.left.move(State.FORWARD)
                     ]
             elif way == State.ANTICLOCKWISE:
                 self.arms_solution += [
                         self.left.move(State.BACK),
-                        self.left.rotate(self.__inverse_way(way)),
+                        self.left.rotate(self.__inverse_way(way), turns=turns),
                         self.left.move(State.FORWARD),
-                        self.left.rotate(way)
+                        self.left.rotate(way, turns=turns)
                     ]
         elif turns == State.DOUBLE_TURN:
             self.rotate_left(State.TURN, way)
             self.rotate_left(State.TURN, way)
 
     def rotate_cube_towards_right(self):
+        if self.lazy_regrip:
+            self.regrip(self.down, State.ANTICLOCKWISE)
+            self.regrip(self.up, State.CLOCKWISE)
+            self.arms_solution += [
+                    self.right.move(State.BACK, False, False),
+                    self.left.move(State.BACK),
+
+                    self.up.rotate(State.CLOCKWISE, False, False),
+                    self.down.rotate(State.ANTICLOCKWISE),
+
+                    self.right.move(State.FORWARD, False, False),
+                    self.left.move(State.FORWARD)
+                ]
+            return
+
         self.arms_solution += [
                 self.down.move(State.BACK),
                 self.down.rotate(State.CLOCKWISE),
@@ -461,6 +682,21 @@ class ArmSolutionGenerator:
             ]
 
     def rotate_cube_upwards(self):
+        if self.lazy_regrip:
+            self.regrip(self.left, State.ANTICLOCKWISE)
+            self.regrip(self.right, State.CLOCKWISE)
+            self.arms_solution += [
+                    self.up.move(State.BACK, False, False),
+                    self.down.move(State.BACK),
+
+                    self.right.rotate(State.CLOCKWISE, False, False),
+                    self.left.rotate(State.ANTICLOCKWISE),
+
+                    self.up.move(State.FORWARD, False, False),
+                    self.down.move(State.FORWARD)
+                ]
+            return
+
         self.arms_solution += [
                 self.left.move(State.BACK),
                 self.left.rotate(State.CLOCKWISE),
@@ -489,27 +725,576 @@ class ArmSolutionGenerator:
         self.rotate_right(turns, way)
 
     def solution(self, rubik_solution):
-        index = 0
-        length = len(rubik_solution)
-
-        while index < length:
-            move = rubik_solution[index]
-            self.rotate(move)
-
-            if 'F' in move or 'B' in move:
-                new_faces = {
-                    'F': 'L',
-                    'R': 'F',
-                    'B': 'R',
-                    'L': 'B'
-                }
-                for i in range(index, length):
-                    if rubik_solution[i][0] in new_faces.keys():
-                        face = new_faces[rubik_solution[i][0]]
-                        if len(rubik_solution[i]) == 2:
-                            face += rubik_solution[i][1]
-                        rubik_solution[i] = face
-            index += 1
+        """
+        Generates the arms' solution for a list of moves.
+
+        Only the up/left/right/down faces can be turned by the arms, so the orientation of the cube is tracked
+        throughout the solution and before each move the cube can be reoriented with any combination of
+        rotate_cube_towards_right/rotate_cube_upwards. The reorientations are planned by looking at the whole
+        list of moves, so that a reorientation which brings a face within reach also serves all the following
+        moves it suits and the total estimated time of the solution is the lowest.
+
+        In the lazy regrip mode the arms get rotated back to where they were at the beginning once the cube is solved.
+
+        :param rubik_solution: List of moves in handwritten notation (like "U", "R'" or "F2"). It doesn't get changed.
+        :return: Nothing.
+        """
+        reorientations, moves = self.__planning_costs()
+        initial_rotations = [arm.current_rotational for arm in self.arms]
+
+        # costs maps each reachable orientation to the lowest time it takes to get there
+        # and choices remembers for each move from which orientation the cheapest way came
+        costs = {0: 0.0}
+        history = []
+        for move in rubik_solution:
+            new_costs = {}
+            choices = {}
+            for target, face_map in enumerate(cube.FACE_MAPS):
+                action = face_map[move[0]] + move[1:]
+                if action not in moves:
+                    continue
+                source = min(costs, key=lambda source: costs[source] +
+                             reorientations[cube.RELATIVE_ORIENTATIONS[source][target]][0])
+                new_costs[target] = costs[source] + \
+                    reorientations[cube.RELATIVE_ORIENTATIONS[source][target]][0] + moves[action]
+                choices[target] = source
+            costs = new_costs
+            history.append(choices)
+
+        # walk back from the cheapest final orientation
+        orientations = []
+        if history:
+            target = min(costs, key=costs.get)
+            for choices in reversed(history):
+                orientations.append(target)
+                target = choices[target]
+            orientations.reverse()
+
+        source = 0
+        for move, target in zip(rubik_solution, orientations):
+            for name in reorientations[cube.RELATIVE_ORIENTATIONS[source][target]][1]:
+                getattr(self, name)()
+            self.rotate(cube.FACE_MAPS[target][move[0]] + move[1:])
+            source = target
+
+        for arm, rotation in zip(self.arms, initial_rotations):
+            self.__rotate_back(arm, rotation)
+
+    def scan_faces(self, faces=cube.FACES, orientation=0):
+        """
+        Generates the arms' solution that brings faces of the cube under the camera and takes a photo of each
+        one of them. The orientation of the cube is tracked like in solution and the faces are visited in the order
+        and with the reorientations that take the lowest estimated time altogether. The whole cube gets scanned by
+        visiting all six faces and a part of it gets scanned again by visiting only some of them.
+
+        :param faces: The faces (from URFDLB) to take photos of, as they were named when the cube was in orientation 0.
+        :param orientation: The orientation of the cube at the beginning, as indexed in cube.ORIENTATIONS.
+        :return: A list with the orientation of the cube (as indexed in cube.ORIENTATIONS) at each photo.
+        """
+        reorientations, _ = self.__planning_costs()
+
+        # Dijkstra over the orientations of the cube and the faces that are still left to take photos of
+        queue = [(0.0, orientation, frozenset(faces), [])]
+        visited = set()
+        while queue:
+            duration, source, left, photos = heapq.heappop(queue)
+            if not left:
+                break
+            if (source, left) in visited:
+                continue
+            visited.add((source, left))
+            for target, face_map in enumerate(cube.FACE_MAPS):
+                # the camera looks at the front face
+                face = next(face for face, destination in face_map.items() if destination == 'F')
+                if face in left and (target, left - {face}) not in visited:
+                    heapq.heappush(queue, (duration + reorientations[cube.RELATIVE_ORIENTATIONS[source][target]][0],
+                                           target, left - {face}, photos + [target]))
+
+        source = orientation
+        for target in photos:
+            for name in reorientations[cube.RELATIVE_ORIENTATIONS[source][target]][1]:
+                getattr(self, name)()
+            self.take_photo()
+            source = target
+        return photos
+
+    def __planning_costs(self):
+        """
+        Estimates how long the moves and the reorientations of the cube take. The estimates only depend on the arms'
+        positions, so they are cached for each of them.
+
+        :return: A tuple with a list and a dictionary. The list has for each relative orientation of the cube
+            (as indexed in cube.ORIENTATIONS) a tuple with the time and the names of the cheapest reorientations that get the
+            cube there. The dictionary maps each move that can be done without reorienting the cube to its time.
+        """
+        key = tuple((arm.current_linear, arm.current_rotational) for arm in self.arms) + (self.lazy_regrip,)
+        if key in self.planning_costs:
+            return self.planning_costs[key]
+
+        # in the lazy regrip mode the time depends on how the arms are rotated, so
+        # each action is measured twice in a row to average over both rotations
+        repeats = 2 if self.lazy_regrip else 1
+
+        moves = {}
+        for face in 'URLD':
+            for modifier in ['', '\'', '2']:
+                moves[face + modifier] = self.__measure(lambda generator: generator.rotate(face + modifier), repeats)
+
+        # Dijkstra over the orientations of the cube using the whole-cube rotations as edges
+        macros = [
+            (cube.face_rotation('U'), 'rotate_cube_towards_right'),
+            (cube.face_rotation('R'), 'rotate_cube_upwards')
+        ]
+        macros = [(matrix, name, self.__measure(lambda generator: getattr(generator, name)(), repeats))
+                  for matrix, name in macros]
+        reorientations = [None] * len(cube.ORIENTATIONS)
+        queue = [(0.0, 0, [])]
+        while queue:
+            duration, idx, path = heapq.heappop(queue)
+            if reorientations[idx] is not None:
+                continue
+            reorientations[idx] = (duration, path)
+            for matrix, name, macro_time in macros:
+                target = cube.ORIENTATION_INDEXES[cube.multiply(matrix, cube.ORIENTATIONS[idx])]
+                if reorientations[target] is None:
+                    heapq.heappush(queue, (duration + macro_time, target, path + [name]))
+
+        self.planning_costs[key] = (reorientations, moves)
+        return self.planning_costs[key]
+
+    def __measure(self, action, repeats=1):
+        """
+        Measures how long the arms take to do something, starting from where the arms currently are.
+
+        :param action: Function that gets called with a copy of this generator to generate the steps.
+        :param repeats: How many times to call the function in a row.
+        :return: The estimated time in seconds, averaged over the repeats.
+        """
+        generator = self.sandbox()
+        for _ in range(repeats):
+            action(generator)
+        return sum(wait for _, wait in generator.compile_timeline()) / repeats
+
+    def sandbox(self):
+        """
+        Creates a generator with an empty solution and with copies of this generator's arms,
+        so that solutions can be generated without changing this generator or its arms.
+
+        :return: An instance of ArmSolutionGenerator.
+        """
+        generator = ArmSolutionGenerator(*copy.deepcopy([self.down, self.left, self.up, self.right]),
+                                         lazy_regrip=self.lazy_regrip)
+        generator.planning_costs = self.planning_costs
+        return generator
 
     def append_command(self, command):
-        self.arms_solution.append(command)
\ No newline at end of file
+        self.arms_solution.append(command)
+
+    def take_photo(self):
+        self.append_command(Step(Opcode.PHOTO))
+
+    def estimate_time(self, rubik_solution):
+        """
+        Estimates how long the arms take to execute a solution, starting from where the arms currently are.
+        The solution gets generated, optimized and compiled into a timeline just like when the cube gets solved,
+        but on a sandbox, so neither this generator nor its arms are changed.
+
+        :param rubik_solution: List of moves in handwritten notation (like "U", "R'" or "F2").
+        :return: The estimated time in seconds.
+        """
+        generator = self.sandbox()
+        generator.solution(rubik_solution)
+        generator.optimize()
+        return sum(wait for _, wait in generator.compile_timeline())
+
+    def servo_travel_time(self, step, previous=None):
+        """
+        Computes the time the servo of a step physically needs to get to its position,
+        regardless of how much delay was recorded in the step itself.
+
+        :param step: A step as returned by the rotate/move/reposition methods of an arm.
+        :param previous: The position of the servo before the step. If it's not given,
+            the servo is considered to go between its low and high positions.
+        :return: The time in seconds.
+        """
+        arm = self.servos[step.servo]
+        if previous is not None:
+            span = abs(step.position - previous)
+        elif step.linear:
+            span = abs(arm.linear_low - arm.linear_high)
+        else:
+            span = abs(arm.rotation_low - arm.rotation_high)
+        return span * arm.rotation_speed + arm.command_delay
+
+    def optimize(self):
+        """
+        Rewrites the arms' solution so that it does the same thing with fewer steps.
+
+        No-op steps (None) are dropped and pairs of steps on the same servo that undo each other
+        are cancelled, which moves them past the steps of the other arms that come in between. That's
+        only done when nothing in between depends on them: no other step of the same arm, no photo, no
+        turn of the cube unless the pair is a free rotation of a retracted up/left/right arm, no change of the
+        grip unless the pair is a free rotation or a grip change of the up arm. An arm that stays retracted
+        instead of being engaged for a while is only allowed if the remaining arms hold the cube like they do
+        somewhere else in the solution. Steps that had to be waited for by the steps issued before them
+        hand over their delay to these. The final position of the servos and the state of the cube stay the same.
+
+        :return: A tuple with the number of removed steps and the amount of estimated time that got removed in seconds.
+        """
+        program = [step for step in self.arms_solution if step is not None]
+        removed = len(self.arms_solution) - len(program)
+        time_before = sum(step.time for step in program if step.opcode == Opcode.SERVO)
+
+        # the ways the cube is held throughout the original solution
+        linear = {}
+        for arm in self.arms:
+            linear[arm] = self.initial_positions[arm][0]
+        tolerated = [self.__engaged_arms(linear)]
+        for step in program:
+            if step.opcode == Opcode.SERVO and step.linear:
+                linear[self.servos[step.servo]] = step.position
+                tolerated.append(self.__engaged_arms(linear))
+
+        cancelled = True
+        while cancelled:
+            cancelled = False
+            states = self.__replay(program)
+
+            for i, first in enumerate(program):
+                if first.opcode != Opcode.SERVO or not states[i]['moving']:
+                    continue
+                arm = self.servos[first.servo]
+
+                # find the next step of the same arm
+                j = i + 1
+                while j < len(program) and not (program[j].opcode == Opcode.SERVO and
+                                                 self.servos[program[j].servo] is arm):
+                    j += 1
+                if j == len(program):
+                    continue
+                second = program[j]
+                if second.servo != first.servo or second.position != states[i]['previous']:
+                    continue
+
+                between = range(i + 1, j)
+                if any(program[k].opcode != Opcode.SERVO for k in between):
+                    continue
+                if first.linear or states[i]['kind'] == 'turn':
+                    if any(states[k]['kind'] == 'turn' for k in between):
+                        continue
+                if states[i]['kind'] == 'turn':
+                    if any(program[k].linear for k in between):
+                        continue
+                if first.linear and arm is not self.up:
+                    # whether the cube drops onto the down arm depends on
+                    # the order in which the down/left/right arms grip it
+                    if any(program[k].linear and self.servos[program[k].servo] is not self.up
+                           for k in between):
+                        continue
+                if first.linear:
+                    # the arm stays where it was before the pair
+                    safe = True
+                    for k in between:
+                        engaged = set(states[k]['engaged'])
+                        if states[i]['previous'] == arm.linear_high:
+                            engaged.add(arm)
+                        else:
+                            engaged.discard(arm)
+                        if not any(engaged >= ways for ways in tolerated):
+                            safe = False
+                            break
+                    if not safe:
+                        continue
+
+                self.__remove_step(program, j)
+                self.__remove_step(program, i)
+                removed += 2
+                cancelled = True
+                break
+
+        self.arms_solution = program
+        time_after = sum(step.time for step in program if step.opcode == Opcode.SERVO)
+
+        return removed, time_before - time_after
+
+    def __engaged_arms(self, linear):
+        """
+        :param linear: Dictionary with the linear position of each arm.
+        :return: The set of arms that are engaged onto the cube.
+        """
+        return frozenset(arm for arm in self.arms if linear[arm] == arm.linear_high)
+
+    def __replay(self, program):
+        """
+        Replays a list of steps and describes each one of them.
+
+        :param program: A list of steps with no None elements.
+        :return: A list with a dictionary for each step with the 'moving', 'kind', 'previous' and 'engaged'
+            keys: whether the servo actually moves, whether it's a 'grip', 'turn' or 'free' step, the previous
+            position of the servo and the set of engaged arms before the step.
+        """
+        linear = {}
+        rotational = {}
+        for arm in self.arms:
+            linear[arm], rotational[arm] = self.initial_positions[arm]
+
+        states = []
+        for step in program:
+            if step.opcode != Opcode.SERVO:
+                states.append({'moving': False, 'kind': None, 'previous': None,
+                               'engaged': self.__engaged_arms(linear)})
+                continue
+
+            arm = self.servos[step.servo]
+            engaged = self.__engaged_arms(linear)
+            if step.linear:
+                previous = linear[arm]
+                kind = 'grip'
+                linear[arm] = step.position
+            else:
+                previous = rotational[arm]
+                kind = 'turn' if arm in engaged or arm is self.down else 'free'
+                rotational[arm] = step.position
+
+            states.append({
+                'moving': step.position != previous,
+                'kind': kind,
+                'previous': previous,
+                'engaged': engaged
+            })
+
+        return states
+
+    @staticmethod
+    def __remove_step(program, idx):
+        """
+        Removes a step from a list of steps. If the step had to be waited for by the steps that were
+        issued right before it, its delay is passed onto the step that comes before it.
+
+        :param program: A list of steps.
+        :param idx: The index of the step to remove.
+        :return: Nothing.
+        """
+        step = program.pop(idx)
+        if idx > 0 and step.opcode == Opcode.SERVO and step.time > 0.0:
+            previous = program[idx - 1]
+            if previous.opcode == Opcode.SERVO and previous.time == 0.0:
+                program[idx - 1] = previous.copy(step.time)
+
+    def compile_timeline(self):
+        """
+        Compiles the generated arms' solution into a timeline of concurrent step groups.
+
+        Every node of the dependency graph is scheduled in the earliest group that comes after all its
+        dependencies. Steps that don't move servos (like taking photos) act as barriers.
+
+        :return: A list of (steps, wait) tuples. All steps of a group are issued at once and then
+            `wait` seconds are waited - the duration of the longest step in the group.
+        """
+        nodes = self.dependency_graph()
+
+        # place each node in the earliest group that comes after all its dependencies
+        levels = []
+        groups = []
+        for node in nodes:
+            level = 0
+            for dep in node['deps']:
+                level = max(level, levels[dep] + 1)
+            levels.append(level)
+            if level == len(groups):
+                groups.append([])
+            groups[level].append(node)
+
+        timeline = []
+        for group in groups:
+            steps = [step for node in group for step in node['steps']]
+            wait = max(node['duration'] for node in group)
+            timeline.append((steps, wait))
+
+        return timeline
+
+    def dependency_graph(self, program=None):
+        """
+        Builds the dependency graph of an arms' solution.
+
+        The steps of an arm are kept in order, a face turned by the up/left/right arm waits for the opposite
+        arm to grip the cube like in the original solution, any other turn of the cube (whole cube rotations or
+        turns of the down arm onto which the cube rests) waits for all arms to grip the cube like in the original
+        solution, the down/left/right arms grip the cube in the original order and an arm only retracts once all
+        the other arms that hold the cube in the original solution are engaged. Steps that don't move servos
+        (like taking photos) depend on everything before them and everything after them depends on them.
+
+        :param program: List of steps that start from where the arms were when the solution got reset.
+            Defaults to the generated arms' solution.
+        :return: A list of nodes in topological order. Each node is a dictionary with the 'steps', 'kind',
+            'duration', 'deps' and 'index' keys: the steps that are issued together, 'grip'/'turn'/'free'/'hold'/'barrier',
+            how long the steps take in seconds, the indexes of the nodes that have to finish before and its own index.
+        """
+        if program is None:
+            program = self.arms_solution
+
+        linear = {}
+        rotational = {}
+        for arm in self.arms:
+            linear[arm], rotational[arm] = self.initial_positions[arm]
+
+        nodes = []
+        segment = []
+        barrier = None
+        for step in program:
+            if step is None:
+                continue
+            if step.opcode == Opcode.SERVO:
+                segment.append(step)
+            else:
+                first = len(nodes)
+                self.__add_dependencies(segment, linear, rotational, nodes, barrier)
+                deps = set(range(first, len(nodes)))
+                if barrier is not None:
+                    deps.add(barrier)
+                barrier = len(nodes)
+                nodes.append({
+                    'steps': [step],
+                    'kind': 'barrier',
+                    'duration': step.time,
+                    'deps': deps,
+                    'index': barrier
+                })
+                segment = []
+        self.__add_dependencies(segment, linear, rotational, nodes, barrier)
+
+        return nodes
+
+    def __add_dependencies(self, segment, linear, rotational, nodes, barrier):
+        """
+        Adds the servo steps of a segment to the dependency graph.
+
+        :param segment: A list of servo steps with no barriers in between.
+        :param linear: Dictionary with the linear position of each arm at the beginning of the segment. It gets updated.
+        :param rotational: Dictionary with the rotational position of each arm at the beginning of the segment. It gets updated.
+        :param nodes: The nodes of the graph so far. The new nodes get appended to it.
+        :param barrier: Index of the barrier node that comes before the segment or None.
+        :return: Nothing.
+        """
+        # how long each step had to wait in the original solution - that's
+        # the delay of the first step that follows it and that actually waits
+        group_waits = [0.0] * len(segment)
+        wait = 0.0
+        for idx in range(len(segment) - 1, -1, -1):
+            if segment[idx].time > 0.0:
+                wait = segment[idx].time
+            group_waits[idx] = wait
+
+        opposites = {
+            self.up: self.down,
+            self.down: self.up,
+            self.left: self.right,
+            self.right: self.left
+        }
+
+        last = {}
+        last_linear = {}
+        last_turn = None
+        last_turn_of = {}
+        last_support = None
+        previous = None
+
+        for idx, step in enumerate(segment):
+            arm = self.servos[step.servo]
+
+            if step.linear:
+                origin = linear[arm]
+                kind = 'grip'
+            else:
+                origin = rotational[arm]
+                # the cube rests on the down arm, so rotating it
+                # can turn the cube even when the arm is retracted
+                if linear[arm] == arm.linear_high or arm is self.down:
+                    kind = 'turn'
+                else:
+                    kind = 'free'
+            moving = step.position != origin
+            if not moving:
+                kind = 'hold'
+
+            if moving:
+                duration = max(step.time, self.servo_travel_time(step, origin))
+            else:
+                duration = group_waits[idx]
+
+            # steps of the same kind that were issued together in the original solution
+            # are kept together - the cube has to be turned by all of them at once
+            if previous is not None and previous['kind'] == kind and kind != 'free' \
+                    and previous['steps'][-1].time == 0.0 \
+                    and step.servo not in [member.servo for member in previous['steps']]:
+                node = previous
+                node['steps'].append(step)
+                node['duration'] = max(node['duration'], duration)
+            else:
+                node = {
+                    'steps': [step],
+                    'kind': kind,
+                    'duration': duration,
+                    'deps': set(),
+                    'index': len(nodes)
+                }
+                if barrier is not None:
+                    node['deps'].add(barrier)
+                nodes.append(node)
+
+            deps = node['deps']
+            if arm in last:
+                deps.add(last[arm]['index'])
+            if kind in ('turn', 'hold'):
+                if last_turn is not None:
+                    deps.add(last_turn['index'])
+                last_turn = node
+
+                # a face turned by the up/left/right arm only needs the opposite arm to hold the
+                # cube, otherwise the cube has to be gripped exactly like in the original solution
+                if kind == 'turn' and arm is not self.down and len(node['steps']) == 1:
+                    gripping = [arm, opposites[arm]]
+                else:
+                    gripping = self.arms
+                for other in gripping:
+                    if other in last_linear:
+                        deps.add(last_linear[other]['index'])
+                    last_turn_of[other] = node
+            elif kind == 'grip':
+                if arm in last_turn_of:
+                    deps.add(last_turn_of[arm]['index'])
+                if step.position != arm.linear_high:
+                    # all the arms that hold the cube have to be engaged before retracting
+                    for other in self.arms:
+                        if other is not arm and linear[other] == other.linear_high and other in last_linear:
+                            deps.add(last_linear[other]['index'])
+                if arm is not self.up:
+                    # whether the cube drops onto the down arm depends on
+                    # the order in which the down/left/right arms grip it
+                    if last_support is not None:
+                        deps.add(last_support['index'])
+                    last_support = node
+                last_linear[arm] = node
+            deps.discard(node['index'])
+
+            if step.linear:
+                linear[arm] = step.position
+            else:
+                rotational[arm] = step.position
+            last[arm] = node
+            previous = node
+
+    @staticmethod
+    def flatten_timeline(timeline):
+        """
+        Turns a timeline back into a list of steps that can be executed one after another.
+        Each group's wait is put on its last step while the others are issued without any delay.
+
+        :param timeline: A list of (steps, wait) tuples as returned by compile_timeline.
+        :return: A list of steps.
+        """
+        sequence = []
+        for steps, wait in timeline:
+            for idx, step in enumerate(steps):
+                sequence.append(step.copy(wait if idx == len(steps) - 1 else 0.0))
+        return sequence
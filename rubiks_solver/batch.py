@@ -0,0 +1,116 @@
+import logging
+import multiprocessing
+import json
+import sys
+import kociemba
+import arms
+import solver
+
+logger = logging.getLogger(__name__)
+
+# the generator of each worker process - it's only used as a template
+# for the sandboxes in which the solutions get generated
+generator = None
+
+def __init_worker(config, lazy_regrip):
+    """
+    Instantiates the arms of a worker process.
+
+    :param config: The configuration dictionary as it comes from the GUI app.
+    :param lazy_regrip: Whether the solutions are generated in the lazy regrip mode.
+    :return: Nothing.
+    """
+    global generator
+    generator = arms.ArmSolutionGenerator(*arms.instantiate_arms(config, 'release'), lazy_regrip=lazy_regrip)
+
+def __plan(job):
+    """
+    Solves a cube and generates the arms' solution for it in a sandbox.
+
+    :param job: A tuple with the cube and how many whole-cube orientations to try when picking the solution.
+        The cube is either a 54-character string of URFDLB labels or a string of moves separated by spaces.
+    :return: A dictionary with the 'cube', 'moves', 'steps' and 'time' keys: the cube as given, the moves
+        of the solution, the number of steps of the arms and the estimated time in seconds. If the cube
+        can't be solved, a dictionary with the 'cube' and 'error' keys: the cube as given and why it can't.
+    """
+    cube, orientations = job
+    try:
+        if len(cube) == 54 and set(cube) <= set('URFDLB'):
+            if orientations > 1:
+                moves = solver.fastest_solution(generator, cube, orientations)
+            else:
+                moves = kociemba.solve(cube).split(' ')
+        else:
+            moves = cube.split()
+
+        sandbox = generator.sandbox()
+        sandbox.solution(moves)
+        sandbox.optimize()
+        timeline = sandbox.compile_timeline()
+    except (ValueError, KeyError) as error:
+        # an invalid cube state or an unknown move only fails its own cube, not the whole batch
+        return {
+            'cube': cube,
+            'error': repr(error)
+        }
+
+    return {
+        'cube': cube,
+        'moves': moves,
+        'steps': sum(len(steps) for steps, _ in timeline),
+        'time': sum(wait for _, wait in timeline)
+    }
+
+def plan(cubes, config, lazy_regrip=True, orientations=1, processes=None, chunksize=8):
+    """
+    Solves many cubes and generates the arms' solutions for them on a pool of processes.
+
+    :param cubes: Iterable of cubes, each being either a 54-character string of URFDLB labels as expected by
+        the muodov/kociemba library or a string of moves in handwritten notation separated by spaces.
+    :param config: The configuration dictionary as it comes from the GUI app.
+    :param lazy_regrip: Whether the solutions are generated in the lazy regrip mode.
+    :param orientations: How many whole-cube orientations to try when solving a cube state. With 1
+        the move-count optimal solution of the muodov/kociemba library is used.
+    :param processes: Number of worker processes. Defaults to the number of cores.
+    :param chunksize: Number of cubes sent to a worker at once.
+    :return: A generator that yields a dictionary with the 'cube', 'moves', 'steps' and 'time' keys for each
+        cube, in the same order as the cubes. Cubes that can't be solved get the 'cube' and 'error' keys instead.
+    """
+    jobs = ((cube, orientations) for cube in cubes)
+    with multiprocessing.Pool(processes, initializer=__init_worker, initargs=(config, lazy_regrip)) as pool:
+        for result in pool.imap(__plan, jobs, chunksize):
+            yield result
+
+if __name__ == '__main__':
+    # usage: python batch.py cubes.txt [config.json]
+    # with a cube state or a string of moves on each line
+    hldr = logging.StreamHandler(sys.stdout)
+    hldr.setLevel(logging.INFO)
+    logging.getLogger().addHandler(hldr)
+    logger.setLevel(logging.INFO)
+
+    with open(sys.argv[1], 'r') as f:
+        cubes = [line.strip() for line in f if line.strip()]
+    config_file = sys.argv[2] if len(sys.argv) > 2 else 'config.json'
+    with open(config_file, 'r') as f:
+        config = json.load(f)
+
+    total_steps = 0
+    total_time = 0.0
+    failures = 0
+    for result in plan(cubes, config):
+        if 'error' in result:
+            failures += 1
+            logger.error('{} -> {}'.format(result['cube'], result['error']))
+            continue
+        total_steps += result['steps']
+        total_time += result['time']
+        logger.info('{} -> {} moves, {} steps, {:.2f} seconds'.format(
+            result['cube'], len(result['moves']), result['steps'], result['time']))
+
+    solved = len(cubes) - failures
+    if solved:
+        logger.info('{} cubes, {:.1f} steps and {:.2f} seconds on average'.format(
+            solved, total_steps / solved, total_time / solved))
+    if failures:
+        logger.info('{} of {} cubes failed'.format(failures, len(cubes)))
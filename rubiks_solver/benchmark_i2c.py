@@ -0,0 +1,66 @@
+import logging
+import time
+import I2C
+import PCA9685
+from fakesmbus import FakeSMBus
+
+logger = logging.getLogger(__name__)
+
+# the register writes the PCA9685 got before block writes were used
+def __legacy_set_pwm(controller, channel, on, off):
+    controller._device.write8(PCA9685.LED0_ON_L + 4 * channel, on & 0xFF)
+    controller._device.write8(PCA9685.LED0_ON_H + 4 * channel, on >> 8)
+    controller._device.write8(PCA9685.LED0_OFF_L + 4 * channel, off & 0xFF)
+    controller._device.write8(PCA9685.LED0_OFF_H + 4 * channel, off >> 8)
+
+def __legacy(controller, values):
+    for channel, (on, off) in enumerate(values):
+        __legacy_set_pwm(controller, channel, on, off)
+
+def __per_channel(controller, values):
+    for channel, (on, off) in enumerate(values):
+        controller.set_pwm(channel, on, off)
+
+def __multi_channel(controller, values):
+    controller.set_pwm_channels(0, values)
+
+def benchmark(servos=8, repeats=1000):
+    """
+    Measures how many I2C transactions it takes to set the PWM of the arms' servos
+    (as when repositioning all of them at once) and how long that takes against a fake SMBus.
+
+    :param servos: Number of consecutive channels that get set, starting with channel 0.
+    :param repeats: How many times the servos are set for each method.
+    :return: A dictionary mapping each method to a tuple with the transactions per update,
+        the bytes written per update and the microseconds per update.
+    """
+    controller = PCA9685.PCA9685(i2c=I2C, busnum=1, i2c_interface=FakeSMBus)
+    bus = controller._device._bus
+    # alternate between two sets of values so that the shadow registers never skip a write
+    frames = [[(0, 150 + 50 * channel) for channel in range(servos)],
+              [(0, 175 + 50 * channel) for channel in range(servos)]]
+
+    __legacy(controller, frames[(repeats - 1) % 2])
+    expected = bytes(bus.device(PCA9685.PCA9685_ADDRESS).registers)
+
+    results = {}
+    for name, method in [('legacy', __legacy), ('per-channel', __per_channel), ('multi-channel', __multi_channel)]:
+        controller.set_all_pwm(0, 0)
+        bus.reset_counters()
+        start = time.perf_counter()
+        for idx in range(repeats):
+            method(controller, frames[idx % 2])
+        elapsed = time.perf_counter() - start
+
+        # all methods have to leave the same bytes in the registers
+        assert bytes(bus.device(PCA9685.PCA9685_ADDRESS).registers) == expected
+        results[name] = (bus.transactions / repeats, bus.bytes_written / repeats, 1e6 * elapsed / repeats)
+
+    return results
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(levelname)2s %(name)s | %(message)s')
+
+    for name, (transactions, written, micros) in benchmark().items():
+        logger.info('{:>13}: {:4.0f} transactions, {:4.0f} bytes and {:6.1f} us for 8 servos'.format(
+            name, transactions, written, micros))
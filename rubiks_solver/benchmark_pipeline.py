@@ -0,0 +1,63 @@
+import logging
+import json
+import sys
+import time
+import hardware
+import main
+
+logger = logging.getLogger(__name__)
+
+def benchmark(config, backend='sim'):
+    """
+    Runs the whole pipeline without the GUI app: the cube gets scanned, solved and the solution
+    gets executed, just like when the buttons of the GUI app are pressed.
+
+    :param config: The configuration dictionary as it comes from the GUI app.
+    :param backend: One of hardware.BACKENDS. On 'sim', the photos come from the directory
+        of the fake camera and the arms move on a fake SMBus, but in real time.
+    :return: A dictionary with the 'read', 'solve', 'moves', 'counters' and 'solutions' keys: the seconds it took
+        to scan the cube, to solve it, the number of moves of the solution, the counters of the PivotPi during the solve
+        and the counters of the solution cache.
+    """
+    # the globals the FSM's model expects
+    main.logger = logging.getLogger('main')
+    main.queues = {}
+    main.camera = main.PiCameraPhotos(hardware.get_camera(backend, config))
+    hardware.instrument_i2c(config)
+    main.pivotpi = hardware.get_pivotpi(backend)
+
+    rubiks = main.RubiksSolver('update')
+    rubiks.config = config
+    rubiks.stop = lambda **kwargs: None
+
+    start = time.monotonic()
+    rubiks.readcube_thread()
+    read = time.monotonic() - start
+    if rubiks.cubesolution is None:
+        raise ValueError('the cube couldn\'t be read')
+
+    rubiks.thread_stopper.clear()
+    start = time.monotonic()
+    rubiks.solvecube_thread()
+    solve = time.monotonic() - start
+
+    return {
+        'read': read,
+        'solve': solve,
+        'moves': len(rubiks.cubesolution),
+        'counters': main.pivotpi.counters(),
+        'solutions': rubiks.solutions.counters()
+    }
+
+if __name__ == '__main__':
+    # usage: RUBIKS_SOLVER_IMAGES=path/to/photos python benchmark_pipeline.py [config.json]
+    logging.basicConfig(level=logging.INFO, format='%(levelname)2s %(name)s | %(message)s')
+
+    config_file = sys.argv[1] if len(sys.argv) > 1 else 'config.json'
+    with open(config_file, 'r') as f:
+        config = json.load(f)
+
+    report = benchmark(config, hardware.get_backend(dict(config, backend='sim')))
+    logger.info('read the cube in {:.2f} seconds and solved it in {} moves and {:.2f} seconds'.format(
+        report['read'], report['moves'], report['solve']))
+    logger.info('solution cache: {hits} hits and {misses} misses'.format(**report['solutions']))
@@ -0,0 +1,226 @@
+import logging
+import json
+import numpy as np
+import cube
+from scipy.optimize import linear_sum_assignment
+
+logger = logging.getLogger(__name__)
+
+# indexes of the cube's centers when its 54 labels are flattened in URFDLB order
+CENTER_INDEXES = [4, 13, 22, 31, 40, 49]
+
+# the cost that keeps a center from getting another color than its own
+FORBIDDEN = 1e9
+
+def confidences(colors, centroids, labels):
+    """
+    Computes how sure it is that each label has its color: 1 when the label sits right on its color's
+    centroid, going down to 0 when it's as far from it as from the closest other color's centroid and below
+    0 when it's closer to another color.
+
+    :param colors: A 54x3 numpy array with the LAB values of the labels.
+    :param centroids: A 6x3 numpy array with the LAB centroids of the colors.
+    :param labels: A numpy array with the color (0-5) of each label.
+    :return: A numpy array with the confidence of each label.
+    """
+    distances = np.sqrt(((colors[:, None, :] - centroids[None, :, :]) ** 2).sum(axis=2))
+    return margins(distances, labels)
+
+def margins(distances, labels):
+    """
+    Computes the confidence of each label out of its distances to the colors, as described in confidences.
+
+    :param distances: A 54x6 numpy array with the distance of each label to each color.
+    :param labels: A numpy array with the color (0-5) of each label.
+    :return: A numpy array with the confidence of each label.
+    """
+    distances = distances.copy()
+    own = distances[np.arange(len(labels)), labels]
+    distances[np.arange(len(labels)), labels] = np.inf
+    other = distances.min(axis=1)
+    return (other - own) / np.maximum(other + own, 1e-9)
+
+def assign(costs):
+    """
+    Assigns exactly 9 labels to each color with the least total cost, with each center keeping its own color.
+
+    :param costs: A 54x6 numpy array with the cost of giving each label each color.
+    :return: A numpy array with the color (0-5) of each label.
+    """
+    costs = costs.copy()
+    costs[CENTER_INDEXES, :] = FORBIDDEN
+    costs[CENTER_INDEXES, range(6)] = 0.0
+    # each color is repeated 9 times, so that each one of its copies takes a label
+    rows, cols = linear_sum_assignment(np.repeat(costs, 9, axis=1))
+    labels = np.empty(len(costs), dtype=np.int64)
+    labels[rows] = cols // 9
+    return labels
+
+def classify(colors, centroids=None, iterations=10):
+    """
+    Gives each label of the cube one of the 6 colors, so that each color gets exactly 9 labels.
+    The colors start from the centers' labels (or from the given centroids) and then the labels
+    are assigned to them with the least total squared LAB distance, after which the centroids move
+    to the mean of their labels and that's repeated until the assignment doesn't change anymore.
+
+    :param colors: A 54x3 numpy array with the LAB values of the labels in URFDLB order.
+    :param centroids: Optional 6x3 numpy array with the LAB centroids of the colors of the U, R, F, D, L and B centers.
+    :param iterations: The most times the labels are assigned.
+    :return: A tuple with a numpy array with the color (0-5) of each label, where color i is the one of the i-th
+        center in URFDLB order, a numpy array with the confidence of each label and the 6x3 centroids.
+    """
+    colors = np.asarray(colors, dtype=np.float64)
+    if centroids is None:
+        centroids = colors[CENTER_INDEXES]
+    centroids = np.asarray(centroids, dtype=np.float64)
+
+    labels = None
+    for _ in range(iterations):
+        assigned = assign(((colors[:, None, :] - centroids[None, :, :]) ** 2).sum(axis=2))
+        if labels is not None and np.array_equal(labels, assigned):
+            break
+        labels = assigned
+        centroids = np.array([colors[labels == color].mean(axis=0) for color in range(6)])
+
+    return labels, confidences(colors, centroids, labels), centroids
+
+def ambiguous_faces(confidence, threshold=0.2, count=2):
+    """
+    Finds the faces whose labels are the least sure to have the right color.
+
+    :param confidence: A numpy array with the confidence of each label in URFDLB order, as returned by classify.
+    :param threshold: A face is ambiguous when one of its labels is less confident than this.
+    :param count: How many of the least confident faces are taken when no face is ambiguous.
+    :return: A list with the ambiguous faces (from URFDLB), the least confident one first.
+    """
+    least = np.asarray(confidence).reshape((6, 9)).min(axis=1)
+    order = np.argsort(least, kind='stable')
+    faces = [cube.FACES[idx] for idx in order if least[idx] < threshold]
+    return faces or [cube.FACES[idx] for idx in order[:count]]
+
+class CalibrationModel(object):
+    def __init__(self, centroids=None, covariances=None, runs=0):
+        """
+        Create a model of the LAB values the 6 colors of the cube have under the robot's camera. The colors of the
+        model aren't tied to the faces of the cube - they get matched to the centers of each scanned cube.
+
+        :param centroids: A 6x3 numpy array with the LAB centroids of the colors or None for an empty model.
+        :param covariances: A 6x3x3 numpy array with the covariances of the colors.
+        :param runs: The number of solves the model has been updated with.
+        """
+        self.centroids = None if centroids is None else np.asarray(centroids, dtype=np.float64)
+        self.covariances = None if covariances is None else np.asarray(covariances, dtype=np.float64)
+        self.runs = runs
+
+    @classmethod
+    def load(cls, path):
+        """
+        Loads a model from disk.
+
+        :param path: Path to the JSON file of the model.
+        :return: The loaded model or an empty one if there's no (valid) file.
+        """
+        try:
+            with open(path, 'r') as f:
+                data = json.load(f)
+            return cls(data['centroids'], data['covariances'], data['runs'])
+        except (IOError, ValueError, KeyError) as error:
+            logger.info('starting with an empty color calibration ({})'.format(error))
+            return cls()
+
+    def save(self, path):
+        """
+        Saves the model to disk.
+
+        :param path: Path to the JSON file of the model.
+        :return: Nothing.
+        """
+        with open(path, 'w') as f:
+            json.dump({
+                'centroids': self.centroids.tolist(),
+                'covariances': self.covariances.tolist(),
+                'runs': self.runs
+            }, f, indent=4)
+
+    def empty(self):
+        """
+        :return: Whether the model hasn't been updated yet.
+        """
+        return self.centroids is None
+
+    def __distances(self, colors):
+        """
+        Computes the Mahalanobis distances of the labels to the colors of the model.
+
+        :param colors: An Nx3 numpy array with LAB values.
+        :return: An Nx6 numpy array with the distance of each value to each color.
+        """
+        differences = colors[:, None, :] - self.centroids[None, :, :]
+        inverses = np.linalg.inv(self.covariances)
+        return np.sqrt(np.maximum(np.einsum('nki,kij,nkj->nk', differences, inverses, differences), 0.0))
+
+    def classify(self, colors, threshold=0.2):
+        """
+        Classifies the labels of a cube with the model: the centers are matched to the colors of the model,
+        after which the labels get assigned to the centers' colors by their Mahalanobis distances to them,
+        with exactly 9 labels for each one of them.
+
+        :param colors: A 54x3 numpy array with the LAB values of the labels in URFDLB order.
+        :param threshold: The least confidence each label must have for the classification to be trusted.
+        :return: None if the model is empty or not confident enough, otherwise a tuple with a numpy array with
+            the color (0-5) of each label, where color i is the one of the i-th center in URFDLB order, a numpy
+            array with the confidence of each label and the palette - the model's color of each center's color.
+        """
+        if self.empty():
+            return None
+        colors = np.asarray(colors, dtype=np.float64)
+
+        distances = self.__distances(colors)
+        _, palette = linear_sum_assignment(distances[CENTER_INDEXES] ** 2)
+        distances = distances[:, palette]
+        labels = assign(distances ** 2)
+        confidence = margins(distances, labels)
+
+        if confidence.min() < threshold:
+            logger.info('the color calibration is only {:.2f} confident'.format(confidence.min()))
+            return None
+        return labels, confidence, palette
+
+    def match(self, centroids):
+        """
+        Matches colors to the ones of the model.
+
+        :param centroids: A 6x3 numpy array with the LAB centroids of the colors.
+        :return: The palette - the model's color of each color. Matches them in order if the model is empty.
+        """
+        if self.empty():
+            return np.arange(6)
+        _, palette = linear_sum_assignment(self.__distances(np.asarray(centroids, dtype=np.float64)) ** 2)
+        return palette
+
+    def update(self, colors, labels, palette, rate=0.2):
+        """
+        Moves the model towards the colors of a cube that got solved.
+
+        :param colors: A 54x3 numpy array with the LAB values of the labels in URFDLB order.
+        :param labels: A numpy array with the color (0-5) of each label, as returned by classify.
+        :param palette: The model's color of each label's color.
+        :param rate: How much the model moves towards the cube's colors. The first update takes them as they are.
+        :return: Nothing.
+        """
+        colors = np.asarray(colors, dtype=np.float64)
+        centroids = np.empty((6, 3))
+        covariances = np.empty((6, 3, 3))
+        for color in range(6):
+            samples = colors[labels == color]
+            centroids[palette[color]] = samples.mean(axis=0)
+            # keep the covariances invertible even when the labels look all the same
+            covariances[palette[color]] = np.cov(samples, rowvar=False) + np.eye(3)
+
+        if self.empty():
+            self.centroids = centroids
+            self.covariances = covariances
+        else:
+            self.centroids = (1.0 - rate) * self.centroids + rate * centroids
+            self.covariances = (1.0 - rate) * self.covariances + rate * covariances
+        self.runs += 1
@@ -0,0 +1,199 @@
+# faces in the order expected by the muodov/kociemba library
+FACES = 'URFDLB'
+
+# the outward normal of each face - X points to the right,
+# Y points upwards and Z points towards the front of the cube
+NORMALS = {
+    'U': (0, 1, 0),
+    'R': (1, 0, 0),
+    'F': (0, 0, 1),
+    'D': (0, -1, 0),
+    'L': (-1, 0, 0),
+    'B': (0, 0, -1)
+}
+
+IDENTITY = ((1, 0, 0), (0, 1, 0), (0, 0, 1))
+
+def facelet_position(face, index):
+    """
+    Computes where a facelet sits on the cube.
+
+    :param face: One of the URFDLB faces.
+    :param index: Index of the facelet on the face (0-8), as numbered by the muodov/kociemba library.
+    :return: A tuple with the position of the facelet's cubie and the normal of the facelet.
+    """
+    row, col = divmod(index, 3)
+    positions = {
+        'U': (col - 1, 1, row - 1),
+        'R': (1, 1 - row, 1 - col),
+        'F': (col - 1, 1 - row, 1),
+        'D': (col - 1, -1, 1 - row),
+        'L': (-1, 1 - row, col - 1),
+        'B': (1 - col, 1 - row, -1)
+    }
+    return positions[face], NORMALS[face]
+
+FACELETS = [facelet_position(face, index) for face in FACES for index in range(9)]
+FACELET_INDEXES = dict((facelet, idx) for idx, facelet in enumerate(FACELETS))
+
+def multiply(a, b):
+    """
+    Multiplies two 3x3 matrices.
+
+    :param a: Matrix as a tuple of rows.
+    :param b: Matrix as a tuple of rows.
+    :return: The product of a and b.
+    """
+    return tuple(tuple(sum(a[i][k] * b[k][j] for k in range(3)) for j in range(3)) for i in range(3))
+
+def transpose(a):
+    """
+    Transposes a 3x3 matrix. For rotations that's also their inverse.
+
+    :param a: Matrix as a tuple of rows.
+    :return: The transposed matrix.
+    """
+    return tuple(zip(*a))
+
+def transform(matrix, vector):
+    """
+    Applies a 3x3 matrix onto a vector.
+
+    :param matrix: Matrix as a tuple of rows.
+    :param vector: A 3-element tuple.
+    :return: The transformed vector.
+    """
+    return tuple(sum(matrix[i][k] * vector[k] for k in range(3)) for i in range(3))
+
+def face_rotation(face):
+    """
+    Computes the rotation matrix that turns a face by 90 degrees clockwise,
+    as seen when looking at the face from outside the cube.
+
+    :param face: One of the URFDLB faces.
+    :return: The rotation matrix.
+    """
+    # Rodrigues' formula for an angle of -90 degrees around the face's normal
+    n = NORMALS[face]
+    cross = ((0, -n[2], n[1]), (n[2], 0, -n[0]), (-n[1], n[0], 0))
+    return tuple(tuple(n[i] * n[j] - cross[i][j] for j in range(3)) for i in range(3))
+
+def __generate_orientations():
+    """
+    Generates all 24 whole-cube rotations by combining quarter turns around the cube's axes.
+
+    :return: A list of rotation matrices, starting with the identity.
+    """
+    generators = [face_rotation('R'), face_rotation('U')]
+    orientations = [IDENTITY]
+    for matrix in orientations:
+        for generator in generators:
+            rotated = multiply(generator, matrix)
+            if rotated not in orientations:
+                orientations.append(rotated)
+    return orientations
+
+ORIENTATIONS = __generate_orientations()
+ORIENTATION_INDEXES = dict((matrix, idx) for idx, matrix in enumerate(ORIENTATIONS))
+
+def face_map(matrix):
+    """
+    Shows where each face ends up after rotating the whole cube.
+
+    :param matrix: The rotation matrix of the whole cube.
+    :return: A dictionary mapping each face to the face it gets moved onto.
+    """
+    faces = dict((normal, face) for face, normal in NORMALS.items())
+    return dict((face, faces[transform(matrix, NORMALS[face])]) for face in FACES)
+
+FACE_MAPS = [face_map(matrix) for matrix in ORIENTATIONS]
+
+# RELATIVE_ORIENTATIONS[i][j] is the index of the whole-cube rotation that takes the cube from the i-th orientation to the j-th
+RELATIVE_ORIENTATIONS = [
+    [ORIENTATION_INDEXES[multiply(target, transpose(source))] for target in ORIENTATIONS]
+    for source in ORIENTATIONS
+]
+
+def rotate_state(cubestate, matrix):
+    """
+    Computes how the cube's state looks like after rotating the whole cube.
+
+    :param cubestate: 54-character string of URFDLB labels as expected by the muodov/kociemba library.
+    :param matrix: The rotation matrix of the whole cube.
+    :return: The state of the rotated cube, with the labels renamed after the new centers.
+    """
+    rotated = [None] * len(FACELETS)
+    for idx, (position, normal) in enumerate(FACELETS):
+        facelet = (transform(matrix, position), transform(matrix, normal))
+        rotated[FACELET_INDEXES[facelet]] = cubestate[idx]
+
+    # each color takes the name of the face its center is now on
+    centers = dict((rotated[9 * i + 4], face) for i, face in enumerate(FACES))
+    return ''.join(centers[label] for label in rotated)
+
+def apply_move(cubestate, move):
+    """
+    Applies a move onto a cube.
+
+    :param cubestate: 54-character string of URFDLB labels as expected by the muodov/kociemba library.
+    :param move: Move in handwritten notation (like "U", "R'" or "F2").
+    :return: The state of the cube after the move.
+    """
+    face = move[0]
+    turns = {'': 1, '2': 2, "'": 3}[move[1:]]
+    axis = NORMALS[face]
+    matrix = IDENTITY
+    for _ in range(turns):
+        matrix = multiply(face_rotation(face), matrix)
+
+    moved = list(cubestate)
+    for idx, (position, normal) in enumerate(FACELETS):
+        # only the facelets of the turned layer move
+        if sum(p * a for p, a in zip(position, axis)) == 1:
+            facelet = (transform(matrix, position), transform(matrix, normal))
+            moved[FACELET_INDEXES[facelet]] = cubestate[idx]
+    return ''.join(moved)
+
+def rotate_moves(moves, matrix):
+    """
+    Maps moves done onto a rotated cube back onto the cube before the rotation.
+
+    :param moves: List of moves in handwritten notation (like "U", "R'" or "F2") for the rotated cube.
+    :param matrix: The rotation matrix of the whole cube.
+    :return: The list of moves that do the same thing on the cube before the rotation.
+    """
+    faces = dict((destination, face) for face, destination in face_map(matrix).items())
+    return [faces[move[0]] + move[1:] for move in moves]
+
+def facelets_facing(matrix, face):
+    """
+    Finds the facelets that sit on a face after rotating the whole cube.
+
+    :param matrix: The rotation matrix of the whole cube.
+    :param face: One of the URFDLB faces.
+    :return: A list with the index (as in FACELETS) of the facelet of the cube before the
+        rotation that sits on each of the face's 9 facelets, as numbered by the muodov/kociemba library.
+    """
+    inverse = transpose(matrix)
+    return [FACELET_INDEXES[tuple(transform(inverse, vector) for vector in facelet_position(face, idx))]
+            for idx in range(9)]
+
+# the face of the cube the camera looks at
+CAMERA_FACE = 'F'
+
+def place_photos(facelets, orientations, photos):
+    """
+    Places what the camera saw onto the facelets of the cube. Both the scan and the rescans of the cube
+    go through here, so the photos always land in the frame the orientations are relative to.
+
+    :param facelets: A list (or numpy array) with an item for each of the 54 facelets in URFDLB order. It gets changed.
+    :param orientations: The orientation of the cube (as indexed in ORIENTATIONS) at each photo, relative to
+        the orientation the facelets are named in.
+    :param photos: For each photo, the 9 items of the face the camera saw, in the order the muodov/kociemba
+        library numbers the facelets of the front face - that's the rows of the photo from top to bottom.
+    :return: The facelets.
+    """
+    for orientation, photo in zip(orientations, photos):
+        for facelet, item in zip(facelets_facing(ORIENTATIONS[orientation], CAMERA_FACE), photo):
+            facelets[facelet] = item
+    return facelets
@@ -0,0 +1,122 @@
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+class Executor(threading.Thread):
+    def __init__(self, pivotpi, stream, stop_event=None, progress=None):
+        """
+        Create a thread that plays back a stream on the PivotPi against absolute deadlines.
+
+        Sleeping for each record's wait after writing it makes the time it takes to write, log and get the GIL
+        back from the GUI add up over hundreds of records. Here every record has a deadline on the
+        time.monotonic() clock that comes from the waits of the records before it, so a record that gets
+        written late only gets less time to wait for and the delay doesn't carry over to the following ones.
+
+        :param pivotpi: An instance of pivotpi.PivotPi.
+        :param stream: List of (channel, register, data, wait) tuples as returned by pivotpi.compile_stream.
+        :param stop_event: Optional threading.Event that stops the playback when it's set. It's waited on
+            instead of sleeping, so the playback stops right away and not only once a wait is over.
+        :param progress: Optional function that gets called with the index of each record once it's written.
+        """
+        super(Executor, self).__init__()
+        self.daemon = True
+        self.pivotpi = pivotpi
+        self.stream = stream
+        self.stop_event = stop_event
+        self.progress = progress
+
+        # how late each record got written in seconds
+        self.lateness = []
+        self.played = 0
+        self.duration = 0.0
+        self.error = None
+
+    def run(self):
+        """
+        Plays back the stream. Records whose servos are already where they're told to go aren't written and
+        when that holds for all the records since the last wait, the wait is skipped and all the following
+        deadlines are moved earlier. An IOError of the PivotPi stops the playback and is kept in the error attribute.
+
+        :return: Nothing.
+        """
+        set_pwm_registers = self.pivotpi.servo_controller.set_pwm_registers
+        monotonic = time.monotonic
+        sleep = time.sleep
+        lateness = self.lateness
+
+        # waits are cut short as soon as the stop event gets set
+        if self.stop_event is not None:
+            wait_until = self.stop_event.wait
+        else:
+            wait_until = sleep
+
+        start = monotonic()
+        deadline = start
+        changed = False
+        try:
+            for idx, (channel, register, data, wait) in enumerate(self.stream):
+                now = monotonic()
+                if deadline > now:
+                    if wait_until(deadline - now):
+                        break
+                    now = monotonic()
+                elif self.stop_event is not None and self.stop_event.is_set():
+                    break
+                lateness.append(now - deadline)
+
+                try:
+                    changed |= set_pwm_registers(register, data)
+                except:
+                    raise IOError("PivotPi not connected")
+                self.played = idx + 1
+                if self.progress is not None:
+                    self.progress(idx)
+
+                if wait > 0.0:
+                    if changed:
+                        deadline += wait
+                    else:
+                        self.pivotpi.skip(wait)
+                    changed = False
+            else:
+                # wait for the last record too
+                now = monotonic()
+                if deadline > now:
+                    wait_until(deadline - now)
+        except IOError as error:
+            self.error = error
+
+        self.duration = monotonic() - start
+
+    def report(self):
+        """
+        Sums up how the playback went.
+
+        :return: A dictionary with the 'played', 'duration', 'max_lateness' and 'mean_lateness' keys: the number of
+            played records, how long the playback took and the worst/average lateness of the records in seconds.
+        """
+        return {
+            'played': self.played,
+            'duration': self.duration,
+            'max_lateness': max(self.lateness) if self.lateness else 0.0,
+            'mean_lateness': sum(self.lateness) / len(self.lateness) if self.lateness else 0.0
+        }
+
+def execute(pivotpi, stream, stop_event=None, progress=None):
+    """
+    Plays back a stream on an executor thread and waits for it to finish.
+
+    :param pivotpi: An instance of pivotpi.PivotPi.
+    :param stream: List of (channel, register, data, wait) tuples as returned by pivotpi.compile_stream.
+    :param stop_event: Optional threading.Event that stops the playback when it's set.
+    :param progress: Optional function that gets called with the index of each record once it's written.
+    :return: The executor once it's done. Its error attribute holds the IOError of the PivotPi if there was one.
+    """
+    executor = Executor(pivotpi, stream, stop_event, progress)
+    executor.start()
+    executor.join()
+    logger.debug('played {played} records in {duration:.3f} seconds, {max_lateness:.4f} seconds late at most '
+                 'and {mean_lateness:.4f} seconds on average'.format(**executor.report()))
+    return executor
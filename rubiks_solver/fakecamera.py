@@ -0,0 +1,57 @@
+import logging
+import os
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+class FakeCamera(object):
+    # extensions of the images that get served
+    EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp')
+
+    def __init__(self, directory, resolution=(1920, 1080)):
+        """
+        Create a camera that stands in for picamera.PiCamera by serving images from disk.
+        The images of the directory are served in the order of their names and once
+        all of them have been served, it starts over with the first one. They're served
+        as they are, so the rotation of the camera has to be in them already.
+
+        :param directory: The directory with the images. For a scan of the cube, it has to hold
+            the photos of the faces in the order in which the robot takes them.
+        :param resolution: Size of the served images when they're not resized.
+        """
+        self.directory = directory
+        self.files = sorted(os.path.join(directory, name) for name in os.listdir(directory)
+                            if name.lower().endswith(self.EXTENSIONS))
+        if not self.files:
+            raise IOError('no images found in {}'.format(directory))
+        self.counter = 0
+        self.resolution = resolution
+
+        # the settings of picamera.PiCamera that are used, only kept around
+        self.rotation = 0
+        self.awb_mode = 'auto'
+        self.awb_gains = None
+        self.framerate = 30
+
+    def capture(self, output, format='jpeg', use_video_port=False, resize=None, **options):
+        """
+        Writes the next image into the output, like picamera.PiCamera.capture does.
+
+        :param output: A file-like object or a file name.
+        :param format: The format the image is saved as.
+        :param use_video_port: Not used.
+        :param resize: Optional (width, height) tuple to which the image gets resized.
+        :return: Nothing.
+        """
+        path = self.files[self.counter % len(self.files)]
+        self.counter += 1
+        logger.debug('serving {}'.format(path))
+
+        img = Image.open(path).convert('RGB')
+        size = resize if resize is not None else self.resolution
+        if img.size != tuple(size):
+            img = img.resize(tuple(size))
+        img.save(output, format={'jpg': 'jpeg'}.get(format, format))
+
+    def close(self):
+        pass
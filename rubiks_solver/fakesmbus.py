@@ -0,0 +1,143 @@
+import logging
+import PCA9685
+
+logger = logging.getLogger(__name__)
+
+class FakePCA9685(object):
+    """
+    Register file of a PCA9685. Block writes/reads go through consecutive registers when the
+    auto-increment bit of MODE1 is set and stay on the same register otherwise. Writes to the
+    ALL_LED registers go to the registers of all 16 channels, while reading them gives 0s.
+    """
+    def __init__(self):
+        self.registers = bytearray(256)
+
+    def write(self, register, data):
+        """
+        Writes bytes starting with a register.
+
+        :param register: The first register.
+        :param data: List of bytes.
+        :return: Nothing.
+        """
+        increment = 1 if self.registers[PCA9685.MODE1] & PCA9685.AI else 0
+        for offset, value in enumerate(data):
+            self.__write(register + increment * offset, value & 0xFF)
+
+    def read(self, register, length):
+        """
+        Reads bytes starting with a register.
+
+        :param register: The first register.
+        :param length: The number of bytes.
+        :return: List of bytes.
+        """
+        increment = 1 if self.registers[PCA9685.MODE1] & PCA9685.AI else 0
+        data = []
+        for offset in range(length):
+            address = (register + increment * offset) & 0xFF
+            data.append(0 if address >= PCA9685.ALL_LED_ON_L else self.registers[address])
+        return data
+
+    def channel(self, channel):
+        """
+        Gets the ON/OFF values of a channel.
+
+        :param channel: The channel (0-15).
+        :return: A tuple with the ON and OFF values, each including its full ON/OFF bit.
+        """
+        register = PCA9685.LED0_ON_L + 4 * channel
+        on_l, on_h, off_l, off_h = self.registers[register:register + 4]
+        return on_l | (on_h << 8), off_l | (off_h << 8)
+
+    def __write(self, register, value):
+        register &= 0xFF
+        if PCA9685.ALL_LED_ON_L <= register <= PCA9685.ALL_LED_OFF_H:
+            offset = register - PCA9685.ALL_LED_ON_L
+            for channel in range(16):
+                self.registers[PCA9685.LED0_ON_L + 4 * channel + offset] = value
+        else:
+            self.registers[register] = value
+
+class FakeSMBus(object):
+    """
+    Stands in for smbus.SMBus when there's no I2C bus around. Each address gets the register file
+    of a PCA9685 and the transactions and the bytes that go over the bus are counted.
+    """
+    # the most bytes an SMBus block transaction can carry
+    BLOCK_SIZE = 32
+
+    def __init__(self, busnum=1):
+        """
+        Create a fake bus.
+
+        :param busnum: Number of the bus. It's only kept around.
+        """
+        self.busnum = busnum
+        self.registers = {}
+        self.transactions = 0
+        self.bytes_written = 0
+        self.bytes_read = 0
+
+    def reset_counters(self):
+        """
+        Sets the transaction/byte counters back to 0.
+
+        :return: Nothing.
+        """
+        self.transactions = 0
+        self.bytes_written = 0
+        self.bytes_read = 0
+
+    def device(self, address):
+        """
+        Gets the register file of a device.
+
+        :param address: The address of the device.
+        :return: An instance of FakePCA9685.
+        """
+        if address not in self.registers:
+            self.registers[address] = FakePCA9685()
+        return self.registers[address]
+
+    def __write(self, address, register, data):
+        if len(data) > self.BLOCK_SIZE:
+            raise IOError('block of {} bytes is over the SMBus limit of {}'.format(len(data), self.BLOCK_SIZE))
+        self.device(address).write(register, data)
+        self.transactions += 1
+        self.bytes_written += len(data)
+
+    def __read(self, address, register, length):
+        if length > self.BLOCK_SIZE:
+            raise IOError('block of {} bytes is over the SMBus limit of {}'.format(length, self.BLOCK_SIZE))
+        self.transactions += 1
+        self.bytes_read += length
+        return self.device(address).read(register, length)
+
+    def write_byte(self, addr, val):
+        self.transactions += 1
+        self.bytes_written += 1
+
+    def write_byte_data(self, addr, cmd, val):
+        self.__write(addr, cmd, [val])
+
+    def write_word_data(self, addr, cmd, val):
+        self.__write(addr, cmd, [val & 0xFF, val >> 8])
+
+    def write_i2c_block_data(self, addr, cmd, vals):
+        self.__write(addr, cmd, list(vals))
+
+    def read_byte(self, addr):
+        self.transactions += 1
+        self.bytes_read += 1
+        return 0
+
+    def read_byte_data(self, addr, cmd):
+        return self.__read(addr, cmd, 1)[0]
+
+    def read_word_data(self, addr, cmd):
+        low, high = self.__read(addr, cmd, 2)
+        return low | (high << 8)
+
+    def read_i2c_block_data(self, addr, cmd, length=32):
+        return self.__read(addr, cmd, length)
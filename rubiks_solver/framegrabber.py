@@ -0,0 +1,133 @@
+import logging
+import threading
+import time
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+class FrameGrabber(object):
+    def __init__(self, resolution=(480, 360), buffers=4):
+        """
+        Create a sink for the raw RGB frames the video port of picamera.PiCamera streams when it's recording.
+        The frames are copied into a ring of buffers that are allocated once, so grabbing a frame neither
+        encodes/decodes a JPEG nor allocates anything.
+
+        :param resolution: A (width, height) tuple with the size of the frames.
+        :param buffers: Number of buffers of the ring. One of them is always left
+            alone for the frame that's being read, so it needs at least 3.
+        """
+        if buffers < 3:
+            raise ValueError('the ring needs at least 3 buffers')
+        self.resolution = resolution
+        width, height = resolution
+        # the camera pads the width of raw frames to a multiple of 32 and the height to one of 16
+        self.padded = ((width + 31) // 32 * 32, (height + 15) // 16 * 16)
+        self.frame_size = self.padded[0] * self.padded[1] * 3
+
+        self.ring = np.empty((buffers, self.padded[1], self.padded[0], 3), dtype=np.uint8)
+        self.flat = self.ring.reshape((buffers, self.frame_size))
+        self.timestamps = [None] * buffers
+        self.frames = 0
+
+        # the buffer that's being filled, how much of it is filled, the one with the last frame and the one being read
+        self.writing = 0
+        self.offset = 0
+        self.latest = None
+        self.reading = None
+        self.condition = threading.Condition()
+
+    def write(self, buf):
+        """
+        Gets called by the camera with the data of the frames.
+
+        :param buf: Bytes of a frame or of a part of it.
+        :return: The number of bytes that got consumed.
+        """
+        data = np.frombuffer(buf, dtype=np.uint8)
+        consumed = 0
+        while consumed < len(data):
+            count = min(len(data) - consumed, self.frame_size - self.offset)
+            self.flat[self.writing, self.offset:self.offset + count] = data[consumed:consumed + count]
+            consumed += count
+            self.offset += count
+            if self.offset == self.frame_size:
+                self.__publish()
+        return len(buf)
+
+    def flush(self):
+        pass
+
+    def __publish(self):
+        """
+        Makes the frame that just got filled the latest one and moves on to the next buffer.
+
+        :return: Nothing.
+        """
+        with self.condition:
+            self.timestamps[self.writing] = time.monotonic()
+            self.latest = self.writing
+            self.frames += 1
+            # skip the buffer with the latest frame and the one that's being read
+            buffers = len(self.ring)
+            idx = (self.writing + 1) % buffers
+            while idx == self.latest or idx == self.reading:
+                idx = (idx + 1) % buffers
+            self.writing = idx
+            self.offset = 0
+            self.condition.notify_all()
+
+    def grab(self, since=None, timeout=1.0):
+        """
+        Gets the latest frame. The returned array is a view into the ring and it stays
+        untouched until release is called or until another frame is grabbed.
+
+        :param since: Optional time.monotonic() timestamp. Only a frame that got
+            done after it is returned, like a frame taken once the arms stopped moving.
+        :param timeout: How many seconds to wait for such a frame.
+        :return: An RGB image as a (height, width, 3) numpy array.
+        """
+        with self.condition:
+            self.__wait(since, timeout)
+            self.reading = self.latest
+
+        width, height = self.resolution
+        return self.ring[self.reading, :height, :width]
+
+    def copy(self, since=None, timeout=1.0):
+        """
+        Gets a copy of the latest frame. Unlike grab, it doesn't hold on to a buffer of the ring,
+        so it can be called from another thread while frames are being grabbed and released.
+
+        :param since: Optional time.monotonic() timestamp. Only a frame that got done after it is returned.
+        :param timeout: How many seconds to wait for such a frame.
+        :return: An RGB image as a (height, width, 3) numpy array.
+        """
+        width, height = self.resolution
+        # the latest frame's buffer isn't written to until another frame is done, which needs the lock
+        with self.condition:
+            self.__wait(since, timeout)
+            return self.ring[self.latest, :height, :width].copy()
+
+    def __wait(self, since, timeout):
+        """
+        Waits for a frame that got done after a timestamp. It has to be called with the condition acquired.
+
+        :param since: Optional time.monotonic() timestamp or None to take any frame.
+        :param timeout: How many seconds to wait for such a frame.
+        :return: Nothing.
+        """
+        deadline = time.monotonic() + timeout
+        while self.latest is None or (since is not None and self.timestamps[self.latest] < since):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0.0:
+                raise IOError('no frame came from the camera in {:.2f} seconds'.format(timeout))
+            self.condition.wait(remaining)
+
+    def release(self):
+        """
+        Lets the ring reuse the buffer of the frame that was grabbed last.
+
+        :return: Nothing.
+        """
+        with self.condition:
+            self.reading = None
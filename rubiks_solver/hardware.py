@@ -0,0 +1,80 @@
+import logging
+import os
+import I2C
+import pivotpi as pp
+
+logger = logging.getLogger(__name__)
+
+# 'pi' drives the robot, 'sim' runs on a fake SMBus and a fake camera
+BACKENDS = ('pi', 'sim')
+
+# environment variables that take precedence over the configuration
+BACKEND_VARIABLE = 'RUBIKS_SOLVER_BACKEND'
+IMAGES_VARIABLE = 'RUBIKS_SOLVER_IMAGES'
+INSTRUMENT_VARIABLE = 'RUBIKS_SOLVER_INSTRUMENT_I2C'
+
+def get_backend(config=None):
+    """
+    Gets the hardware backend to run on.
+
+    :param config: Optional configuration dictionary. Its 'backend' key is used
+        when the RUBIKS_SOLVER_BACKEND environment variable isn't set.
+    :return: One of the BACKENDS. Defaults to 'pi'.
+    """
+    backend = os.environ.get(BACKEND_VARIABLE)
+    if not backend and config is not None:
+        backend = config.get('backend')
+    backend = backend or 'pi'
+    if backend not in BACKENDS:
+        raise ValueError('unknown backend {}, expected one of {}'.format(backend, ', '.join(BACKENDS)))
+    return backend
+
+def get_pivotpi(backend, addr=0x40):
+    """
+    Instantiates the PivotPi of a backend.
+
+    :param backend: One of the BACKENDS.
+    :param addr: The address of the PivotPi.
+    :return: An instance of pivotpi.PivotPi. On the 'sim' backend it talks to a fakesmbus.FakeSMBus.
+    """
+    if backend == 'sim':
+        from fakesmbus import FakeSMBus
+        return pp.PivotPi(addr, busnum=1, i2c_interface=FakeSMBus)
+    return pp.PivotPi(addr)
+
+def get_camera(backend, config=None):
+    """
+    Instantiates the camera of a backend.
+
+    :param backend: One of the BACKENDS.
+    :param config: Optional configuration dictionary. On the 'sim' backend, its 'images' key is the directory
+        with the served images when the RUBIKS_SOLVER_IMAGES environment variable isn't set. Defaults to 'images'.
+    :return: An instance of picamera.PiCamera or of fakecamera.FakeCamera on the 'sim' backend.
+    """
+    if backend == 'sim':
+        from fakecamera import FakeCamera
+        directory = os.environ.get(IMAGES_VARIABLE)
+        if not directory and config is not None:
+            directory = config.get('images')
+        return FakeCamera(directory or 'images')
+
+    import picamera
+    return picamera.PiCamera()
+
+def instrument_i2c(config=None):
+    """
+    Turns on the instrumentation of the I2C transactions if it's asked for.
+
+    :param config: Optional configuration dictionary. Its 'instrument_i2c' key is used
+        when the RUBIKS_SOLVER_INSTRUMENT_I2C environment variable isn't set.
+    :return: The I2C.Instrumentation object or None if it's not asked for.
+    """
+    enabled = os.environ.get(INSTRUMENT_VARIABLE)
+    if enabled:
+        enabled = enabled.lower() not in ('0', 'false', 'no', 'off')
+    elif config is not None:
+        enabled = config.get('instrument_i2c', False)
+    if not enabled:
+        return None
+    logger.info('instrumenting the I2C transactions')
+    return I2C.enable_instrumentation()
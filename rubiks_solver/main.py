@@ -1,26 +1,53 @@
 from tkinter import ttk
 from queue import Queue
 from queue import Empty
-from time import sleep
+from time import sleep, monotonic
 from PIL import ImageTk, Image, ImageDraw
-from sklearn.cluster import KMeans
-from operator import itemgetter
-from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
 
 import tkinter as tk
 import threading as td
-import picamera
 import cv2
 import numpy as np
 import arms
+import cube
 import pivotpi as pp
-import kociemba
+import executor
+import hardware
+import framegrabber
+import vision
+import colors
+import I2C
+import solver
+import solutioncache
 import io
+import hashlib
 import json
 import transitions
 import logging
 import sys
 
+# the most time it may take to stop the arms, in seconds
+STOP_LATENCY_BUDGET = 0.02
+
+# how long a thread that's stopped gets to finish before it's given up on, in seconds
+STOP_TIMEOUT = 10.0
+
+# the color calibration, kept next to config.json
+CALIBRATION_FILE = 'calibration.json'
+
+# the solutions of the cubes seen before, kept next to config.json
+SOLUTIONS_FILE = 'solutions.json.gz'
+
+# how long after the arms stop a frame has to be done to not be blurred by the motion, in seconds
+FRAME_SETTLE = 0.04
+
+# how many times the ambiguous faces get new photos when the labels don't make up a valid cube
+RESCAN_ATTEMPTS = 2
+
+# a face is ambiguous when one of its labels is less confident than this
+RESCAN_CONFIDENCE = 0.2
+
 class QueuePubSub():
     '''
     Class that implements the notion of subscribers/publishers by using standard queues
@@ -111,7 +138,8 @@ class Solver(Page):
         self.after(50, self.refresh_page)
 
     def button_action(self, label):
-        self.pub.publish(self.channel, label)
+        # the time of the press is sent along, so that how long it takes to stop the arms can be measured from it
+        self.pub.publish(self.channel, (label, monotonic()))
 
     def refresh_page(self):
         try:
@@ -330,13 +358,18 @@ class Arms(Page):
 
             # save config file
             if label == self.button_names[1]:
+                # the double positions can't be set from here, so they're kept as they are
+                servos = config.get('servos', {})
                 config['servos'] = {}
                 for idx, _ in enumerate(self.arms * 2):
+                    servo = 's{}'.format(idx + 1)
                     arm = {
                         'low': self.low_servo_vals[idx].get(),
                         'high': self.high_servo_vals[idx].get()
                     }
-                    config['servos']['s{}'.format(idx + 1)] = arm
+                    if 'double' in servos.get(servo, {}):
+                        arm['double'] = servos[servo]['double']
+                    config['servos'][servo] = arm
                 try:
                     with open(config_file, 'w') as f:
                         json.dump(config, f, indent=4, sort_keys=True)
@@ -346,7 +379,7 @@ class Arms(Page):
             self.pub.publish(self.channel_cfg, config)
 
         elif label == self.button_names[2]:
-            self.pub.publish(self.channel_solver, label)
+            self.pub.publish(self.channel_solver, (label, monotonic()))
             
 
 class MainView(tk.Tk):
@@ -390,9 +423,9 @@ class MainView(tk.Tk):
         self.frames['Solver'].show()
 
 class PiCameraPhotos():
-    def __init__(self):
+    def __init__(self, camera):
         # initialize camera with a set of predefined values
-        self.camera = picamera.PiCamera()
+        self.camera = camera
         # self.camera.resolution = (1920, 1080)
         # self.camera.framerate = 30
         # self.camera.sensor_mode = 1
@@ -407,6 +440,37 @@ class PiCameraPhotos():
         # also initialize the container for the image
         self.stream = io.BytesIO() 
 
+        # the sink of the raw frames while streaming
+        self.grabber = None
+
+        # the extractor of the color patches for the last camera configuration
+        self.extractor = None
+
+    def start_streaming(self, resolution=(480, 360)):
+        """
+        Starts streaming raw RGB frames from the video port into a ring of buffers,
+        so that grabbing a frame doesn't have to go through a JPEG anymore.
+        Cameras that can't record keep on capturing JPEGs.
+        :param resolution: A (width, height) tuple with the size of the frames.
+        :return: Nothing.
+        """
+        if self.grabber is not None or not hasattr(self.camera, 'start_recording'):
+            return
+        self.grabber = framegrabber.FrameGrabber(resolution)
+        self.camera.start_recording(self.grabber, format='rgb', resize=resolution)
+        logger.debug('started streaming frames')
+
+    def stop_streaming(self):
+        """
+        Stops streaming frames.
+        :return: Nothing.
+        """
+        if self.grabber is None:
+            return
+        self.camera.stop_recording()
+        self.grabber = None
+        logger.debug('stopped streaming frames')
+
     def capture(self):
         """
         Captures an image from the Pi Camera.
@@ -418,6 +482,26 @@ class PiCameraPhotos():
         logger.info('image captured')
         return Image.open(self.stream)
 
+    def grab(self, since=None, copy=False):
+        """
+        Gets an image from the Pi Camera. While streaming, that's the latest frame
+        from the ring of buffers and otherwise it's a captured one.
+        :param since: Optional time.monotonic() timestamp. While streaming, only a frame
+        that got done after it is returned, like one taken once the arms stopped moving.
+        :param copy: Whether the frame is copied out of the ring while streaming. A copy doesn't
+        hold on to a buffer of the ring, so it's what has to be used besides the scan.
+        :return: RGB image as numpy array. While streaming and not copying, it's a view into
+        the ring that stays untouched until the grabber gets released.
+        """
+        grabber = self.grabber
+        if grabber is not None:
+            if copy:
+                return grabber.copy(since)
+            img = grabber.grab(since)
+            logger.info('frame grabbed')
+            return img
+        return np.asarray(self.capture())
+
     def get_camera_roi(self, xoff, yoff, dim, pad):
         """
         Computes the Regions-of-Interest for the cube's labels.
@@ -439,16 +523,16 @@ class PiCameraPhotos():
                 }
         return roi
 
-    def get_processed_image(self):
+    def get_processed_image(self, since=None):
         """
         Captures an image and processes it. It applies the CLAHE algorithm,
         a Gaussian blur and an increase of the image's saturation by a fixed amount.
+        :param since: Optional time.monotonic() timestamp after which the image has to be taken.
         :return: RGB image as numpy array.
         """
 
-        # convert the captured image to a numpy array
-        img = self.capture()
-        img = np.asarray(img)
+        # get the image as a numpy array - a copy, because the preview can run while the cube gets scanned
+        img = self.grab(since, copy=True)
 
         # # apply CLAHE algorithm to increase contrast in
         # # low lighting areas of the image and preserve
@@ -494,32 +578,51 @@ class PiCameraPhotos():
 
         return img
 
-    def get_camera_color_patches(self, xoff, yoff, dim, pad):
+    def get_camera_color_patches(self, xoff, yoff, dim, pad, since=None):
         """
         Captures an image, processes it and selects the Regions-of-Interest, after which
         they get averaged and a array of 3x3x3 elements are returned: 3x3 labels by 3
-        channels. Each pixel needs 3 channels.
-        It needs the `xoff`, `yoff`, `dim` and `pad` arguments when calling get_camera_roi
-        method.
+        channels. Each pixel needs 3 channels. It's processed just like get_processed_image
+        does it, but only where the Regions-of-Interest are.
+        It needs the `xoff`, `yoff`, `dim` and `pad` arguments to find the Regions-of-Interest
+        like the get_camera_roi method does.
+        :param since: Optional time.monotonic() timestamp after which the image has to be taken.
         :return: A LAB image as a 3x3x3 numpy array for all 9 labels of a cube's face.
         """
-        img = self.get_processed_image()
-        img = cv2.cvtColor(img, cv2.COLOR_RGB2LAB)
-        roi = self.get_camera_roi(xoff, yoff, dim, pad)
-        color_patches = np.zeros(shape=(3, 3, 3), dtype=np.uint8)
+        return self.process_camera_roi(self.snap_camera_roi(xoff, yoff, dim, pad, since))
 
-        for row in range(3):
-            for col in range(3):
-                cropper = roi[row][col]
-                x = cropper['x']
-                y = cropper['y']
-                dim = cropper['dim']
-                temp = img[y:y+dim, x:x+dim]
-                temp = temp.reshape(temp.shape[0] * temp.shape[1], temp.shape[2])
-                pixel = temp.mean(axis=0)
-                color_patches[row, col, :] = [int(x) for x in pixel]
+    def snap_camera_roi(self, xoff, yoff, dim, pad, since=None):
+        """
+        Captures an image and cuts out the Regions-of-Interest together with the margins
+        their processing needs. That's the only part of get_camera_color_patches that needs
+        the camera, so once it returns the arms can move on while process_camera_roi runs.
+        :param since: Optional time.monotonic() timestamp after which the image has to be taken.
+        :return: A tuple with the vision.PatchExtractor and the windows of the Regions-of-Interest
+        as a numpy array, to be passed to process_camera_roi.
+        """
+        grabber = self.grabber
+        img = self.grab(since)
+        try:
+            # only the Regions-of-Interest get blurred and converted to LAB
+            key = (xoff, yoff, dim, pad, img.shape[:2], vision.KSIZE)
+            if self.extractor is None or self.extractor.key != key:
+                self.extractor = vision.PatchExtractor(xoff, yoff, dim, pad, img.shape)
+            extractor = self.extractor
+            windows = extractor.cut(img)
+        finally:
+            if grabber is not None:
+                grabber.release()
+        return extractor, windows
 
-        return color_patches
+    def process_camera_roi(self, snapped):
+        """
+        Processes the Regions-of-Interest of an image like get_processed_image does
+        and averages them. It has to be called from a single thread at a time.
+        :param snapped: What snap_camera_roi returned.
+        :return: A LAB image as a 3x3x3 numpy array for all 9 labels of a cube's face.
+        """
+        extractor, windows = snapped
+        return extractor.process(windows)
 
 class RubiksSolver():
     def __init__(self, channel):
@@ -533,28 +636,191 @@ class RubiksSolver():
         self.thread = None
         self.cubesolution = None
 
-    def __execute_command(self, command):
+        # the colors of the cube as the camera sees them and the last scan to calibrate them with
+        self.calibration = colors.CalibrationModel.load(CALIBRATION_FILE)
+        self.scan = None
+
+        # the solutions of the cubes seen before and the state of the cube that's read
+        self.solutions = solutioncache.SolutionCache.load(SOLUTIONS_FILE)
+        self.cubestate = None
+
+    def __calibrate_colors(self):
         """
-        Execute a command on the PivotPi.
-        :param command: A dictionary containing the 'time', 'servo' and
-        'position' keys representing the time needed for the command to get
-        executed, the servo onto which the action has to be applied (starts from 1)
-        and the position in degrees at which the servo has to move to.
-        :return: True if it succeeded or False otherwise.
+        Updates the color calibration with the colors of the last scan and saves it.
+        :return: Nothing.
         """
-        time = command['time']
-        # we know the servo number is the 2nd element of the string
-        servo = int(command['servo'][1]) - 1
-        position = command['position']
+        self.calibration.update(*self.scan)
+        self.scan = None
+        try:
+            self.calibration.save(CALIBRATION_FILE)
+        except IOError as error:
+            logger.error('couldn\'t save the color calibration: {}'.format(error))
+        logger.info('updated the color calibration ({} solves so far)'.format(self.calibration.runs))
 
-        # move the servo
+    def __save_solutions(self):
+        """
+        Saves the solution cache.
+        :return: Nothing.
+        """
         try:
-            pivotpi.angle(servo, position)
-            sleep(time)
-        except:
-            return False
+            self.solutions.save(SOLUTIONS_FILE)
+        except IOError as error:
+            logger.error('couldn\'t save the solution cache: {}'.format(error))
 
-        return True
+    def __arms_setup(self, generator):
+        """
+        Describes what the arms' solution depends on besides the moves: the configuration
+        of the servos and where the arms are when the solution starts.
+        :param generator: The arms.ArmSolutionGenerator the solution gets generated with.
+        :return: A short hash that's the same for arms that get the same solution for the same moves.
+        """
+        positions = [(arm.current_linear, arm.current_rotational) for arm in generator.arms]
+        setup = json.dumps([self.config['servos'], positions, generator.lazy_regrip], sort_keys=True)
+        return hashlib.sha1(setup.encode('utf-8')).hexdigest()[:16]
+
+    def __log_counters(self, run):
+        """
+        Logs how many servo writes and how much waiting got saved in a run.
+        :param run: Name of the run.
+        :return: Nothing.
+        """
+        counters = pivotpi.counters()
+        logger.info('{}: {} servo writes, {} skipped writes and {:.2f} seconds saved'.format(
+            run, counters['writes'], counters['skipped_writes'], counters['seconds_saved']))
+        instrumentation = I2C.get_instrumentation()
+        if instrumentation is not None:
+            for line in instrumentation.summary():
+                logger.info('{}: {}'.format(run, line))
+
+    def __reset_counters(self):
+        """
+        Resets the counters of the PivotPi and of the I2C transactions at the start of a run.
+        :return: Nothing.
+        """
+        pivotpi.reset_counters()
+        instrumentation = I2C.get_instrumentation()
+        if instrumentation is not None:
+            instrumentation.reset()
+
+    def __take_photos(self, generator):
+        """
+        Executes the arms' solution of a generator while taking a photo at each of its photo steps.
+        :param generator: The arms.ArmSolutionGenerator with the motions and the photos.
+        :return: A list with a LAB image as a 3x3x3 numpy array for each photo or None if
+        it got stopped or the scan failed, in which case the thread stopper is set.
+        """
+        # get the generated sequence with the independent steps running concurrently
+        timeline = generator.compile_timeline()
+        logger.debug('compiled {} steps into {} groups'.format(sum(len(steps) for steps, _ in timeline), len(timeline)))
+        sequence = generator.flatten_timeline(timeline)
+
+        # split the sequence at the photos and compile the motions in between
+        # ahead of time into the register writes of the PivotPi
+        segments = [[]]
+        for step in sequence:
+            if step and step.opcode == arms.Opcode.PHOTO:
+                segments.append([])
+            elif step:
+                segments[-1].append(step)
+        streams = [pp.compile_stream(segment) for segment in segments]
+
+        # the progress bar goes over the records of all streams and the photos
+        length = sum(len(stream) for stream in streams) + len(streams) - 1
+        done = 0
+        def progress(idx):
+            self.pub.publish(self.channel, {
+                'solve_button_locked': False,
+                'read_status': 100 * (done + idx + 1) / length,
+                'solve_status': 0
+            })
+
+        # execute the generated sequence of motions
+        # while at the same time capturing the photos of the cube -
+        # they only get taken here and are processed on a worker
+        # thread, so the arms don't have to wait for that to move on
+        worker = ThreadPoolExecutor(max_workers=1)
+        numeric_faces = []
+        # stream frames so that taking the photos doesn't go through JPEGs
+        camera.start_streaming()
+        try:
+            # pic_counter = 0
+            for idx, stream in enumerate(streams):
+                # take photos after each rotation of the bloody cube
+                if idx > 0:
+                    xoff = self.config['camera']['X Offset (px)']
+                    yoff = self.config['camera']['Y Offset (px)']
+                    dim = self.config['camera']['Size (px)']
+                    pad = self.config['camera']['Pad (px)']
+                    try:
+                        snapped = camera.snap_camera_roi(xoff, yoff, dim, pad, since)
+                    except IOError as error:
+                        self.__scan_failed(error)
+                        return None
+                    numeric_faces.append(worker.submit(camera.process_camera_roi, snapped))
+                    done += 1
+                    progress(-1)
+
+                    # enable this if you want to have the cube's pics saved
+                    # img = camera.get_processed_image()
+                    # img = Image.fromarray(img)
+                    # img.save("{}.png".format(pic_counter))
+                    # pic_counter += 1
+
+                # don't move on if a photo couldn't be processed
+                failed = [lab_face for lab_face in numeric_faces if lab_face.done() and lab_face.exception()]
+                if failed:
+                    self.__scan_failed(failed[0].exception())
+                    return None
+
+                run = executor.execute(pivotpi, stream, self.thread_stopper, progress)
+                done += len(stream)
+                # the arms stopped, so the photo has to come from a frame that's done a bit later
+                since = monotonic() + FRAME_SETTLE
+                # quit process if it has been stopped
+                if self.thread_stopper.is_set():
+                    return None
+                if run.error is not None:
+                    self.__scan_failed(run.error)
+                    return None
+        finally:
+            camera.stop_streaming()
+            worker.shutdown(wait=False)
+
+        try:
+            return [lab_face.result() for lab_face in numeric_faces]
+        except Exception as error:
+            self.__scan_failed(error)
+            return None
+
+    def __scan_failed(self, error):
+        """
+        Gives up on reading the cube and brings the FSM into its rest state.
+        :param error: The exception that made the scan fail.
+        :return: Nothing.
+        """
+        logger.error('the cube couldn\'t be scanned: {}'.format(error))
+        self.cubesolution = None
+        self.thread_stopper.set()
+        self.stop(hard=False)
+
+    def __classify_colors(self, rubiks_colors):
+        """
+        Classifies the labels of the cube, with 9 labels for each center's color. The color calibration
+        is tried first and only if it's not confident enough, the labels are classified from scratch.
+        The scan is kept for calibrating the colors once the cube gets solved.
+        :param rubiks_colors: A 54x3 numpy array with the LAB values of the labels in URFDLB order.
+        :return: A tuple with a numpy array with the color (0-5) of each label and one with their confidence.
+        """
+        classified = self.calibration.classify(rubiks_colors)
+        if classified is None:
+            rubiks_labels, confidence, centroids = colors.classify(rubiks_colors)
+            palette = self.calibration.match(centroids)
+        else:
+            rubiks_labels, confidence, palette = classified
+            logger.debug('classified the labels with the color calibration')
+        logger.debug('classified the labels with a confidence of {:.2f} at least'.format(confidence.min()))
+        self.scan = (rubiks_colors, rubiks_labels, palette)
+        return rubiks_labels, confidence
 
     def __instantiate_arms(self, config, mode):
         """
@@ -563,34 +829,7 @@ class RubiksSolver():
         :param mode: 'fix' or 'release'.
         :return: A list of 4 elements with instances of the arms.Arm class.
         """
-        robot_arms = []
-        servos = config['servos']
-
-        if mode == 'fix':
-            pos = 'low'
-        elif mode == 'release':
-            pos = 'high'
-        else:
-            return None
-
-        keys = list(servos.keys())
-        keys.sort()
-
-        # because there are 4 arms
-        for i in range(4):
-            linear_servo = keys[2 * i]
-            rotational_servo = keys[2 * i + 1]
-            linear_cfg = servos[linear_servo]
-            rotational_cfg = servos[rotational_servo]
-            robot_arms.append(
-                arms.Arm(linear_servo, rotational_servo,
-                         linear_cfg['low'], linear_cfg['high'],
-                         rotational_cfg['low'], rotational_cfg['high'],
-                         linear_cfg[pos], rotational_cfg['low'],
-                         rotation_speed=0.004, command_delay=0.05)
-            )
-
-        return robot_arms
+        return arms.instantiate_arms(config, mode)
 
     def __instantiate_arms_in_release_mode(self, config):
         """
@@ -608,7 +847,7 @@ class RubiksSolver():
         """
         return self.__instantiate_arms(config, mode='fix')
 
-    def __generate_handwritten_solution_from_cube_state(self, cube_centers, rubiks_labels):
+    def __generate_handwritten_solution_from_cube_state(self, cube_centers, rubiks_labels, orientation=0):
         """
         Generate movement solution for the robot's arms. This method returns the sequence of
         steps required for the robot to solve the cube.
@@ -616,6 +855,8 @@ class RubiksSolver():
         :param cube_centers: A 6-element list containing the numeric labels for each face's center.
         :param rubiks_labels: Flattened Rubik's cube labels in the order expected by the muodov/kociemba library.
         These labels are numeric.
+        :param orientation: The orientation of the cube (as indexed in cube.ORIENTATIONS) relative to the one
+        its labels were read in. The solution is for the cube as it's oriented now.
         :return:
         """
         # generate dictionary to map between center labels as
@@ -627,10 +868,16 @@ class RubiksSolver():
         # generate the cube's state as a list of strings of 6x9 labels
         cubestate = [kociembas_input_labels[label] for label in rubiks_labels]
         cubestate = ''.join(cubestate)
+        cubestate = cube.rotate_state(cubestate, cube.ORIENTATIONS[orientation])
 
-        # generate the solution for the given cube's state
-        solved = kociemba.solve(cubestate)
-        solved = solved.split(' ')
+        # generate the solution that takes the arms the least amount of time
+        # unless the cube has been seen before
+        self.cubestate = cubestate
+        solved = self.solutions.get(cubestate)
+        if solved is None:
+            solved = solver.fastest_solution(self.generator, cubestate, time_budget=5.0)
+            self.solutions.put(cubestate, solved)
+        logger.info('solution cache: {hits} hits and {misses} misses'.format(**self.solutions.counters()))
 
         return solved
 
@@ -660,20 +907,51 @@ class RubiksSolver():
     def block_solve(self, event):
         """
         Blocks the solve button and stops the arms' motors.
-        :param event: Not necessary here.
+        :param event: Can have 'hard' and 'pressed' keys: whether the power of the servos gets cut and the
+        monotonic() time of the button press the stop's latency is measured from. Without it, it's measured from now.
         :return: Nothing.
         """
         logger.debug('block solve button')
-        if self.thread != None and not self.thread_stopper.is_set():
-            self.thread_stopper.set()
-            self.thread.join()
+        pressed = event.kwargs.get('pressed', monotonic())
         hard = event.kwargs.get('hard')
+        thread = self.thread
+        # a thread can stop the FSM itself, like when the cube is already solved, and it can't wait for itself
+        if thread is td.current_thread():
+            thread = None
+        if thread != None and not self.thread_stopper.is_set():
+            # the waits of the executor wake up as soon as the stopper is set,
+            # but don't let a thread that's busy with something else hold back the stop
+            self.thread_stopper.set()
+            thread.join(STOP_LATENCY_BUDGET)
         if hard is True:
             # cut the power from the servos
             logger.debug('hard stop servos')
+            try:
+                pivotpi.cut_power()
+            except IOError as error:
+                logger.error(error)
         else:
             # just stop the motors but don't cut the power
             logger.debug('soft stop servos')
+
+        latency = monotonic() - pressed
+        if latency > STOP_LATENCY_BUDGET:
+            logger.warning('stopping took {:.1f} ms, which is over the budget of {:.1f} ms'.format(
+                1000 * latency, 1000 * STOP_LATENCY_BUDGET))
+        else:
+            logger.info('stopped in {:.1f} ms'.format(1000 * latency))
+
+        # a thread that didn't make it in time stops at its next wait or
+        # before its next write, after which the power gets cut once more
+        if thread != None and thread.is_alive():
+            thread.join(STOP_TIMEOUT)
+            if thread.is_alive():
+                logger.error('the {} thread didn\'t stop in {:.1f} seconds'.format(thread.name, STOP_TIMEOUT))
+            if hard is True:
+                try:
+                    pivotpi.cut_power()
+                except IOError as error:
+                    logger.error(error)
         # and publish what's necessary for the GUI
         self.pub.publish(self.channel, {
             'solve_button_locked': True,
@@ -706,120 +984,87 @@ class RubiksSolver():
         })
 
         # instantiate arms and reposition
-        robot_arms = self.__instantiate_arms_in_release_mode(self.config)
+        try:
+            robot_arms = self.__instantiate_arms_in_release_mode(self.config)
+        except ValueError as error:
+            self.__scan_failed(error)
+            return
         generator = arms.ArmSolutionGenerator(*robot_arms)
         generator.reposition_arms(delay=1.0)
         generator.fix()
 
         # generate the sequence of motions and actions to
-        # scan the rubik's cube
+        # scan the rubik's cube the fastest
         generator = arms.ArmSolutionGenerator(*robot_arms)
-        generator.append_command('take photo')
-        generator.rotate_cube_towards_right()
-        generator.append_command('take photo')
-        generator.rotate_cube_towards_right()
-        generator.append_command('take photo')
-        generator.rotate_cube_towards_right()
-        generator.append_command('take photo')
-        generator.rotate_cube_upwards()
-        generator.append_command('take photo')
-        generator.rotate_cube_upwards()
-        generator.rotate_cube_upwards()
-        generator.append_command('take photo')
-
-        # save the generator for solving the cube
+        orientations = generator.scan_faces()
+
+        # save the generator for solving the cube - the solution
+        # only regrips the cube when an arm can't turn anymore
+        generator.lazy_regrip = True
         self.generator = generator
 
-        # get the generated sequence
-        sequence = generator.arms_solution
+        self.__reset_counters()
+        numeric_faces = self.__take_photos(generator)
+        if numeric_faces is None:
+            return
 
-        # execute the generated sequence of motions
-        # while at the same time capturing the photos of the cube
-        numeric_faces = []
-        length = len(sequence)
-        # pic_counter = 0
-        for idx, step in enumerate(sequence):
-            # quit process if it has been stopped
-            if self.thread_stopper.is_set():
-                return
-            # take photos or rotate the bloody cube
-            if step:
-                logger.debug('Execute \'' + str(step) + '\'')
-                if step == 'take photo':
-                    xoff = self.config['camera']['X Offset (px)']
-                    yoff = self.config['camera']['Y Offset (px)']
-                    dim = self.config['camera']['Size (px)']
-                    pad = self.config['camera']['Pad (px)']
-                    lab_face = camera.get_camera_color_patches(xoff, yoff, dim, pad)
-                    numeric_faces.append(lab_face)
+        self.__log_counters('scanning')
 
-                    # enable this if you want to have the cube's pics saved
-                    # img = camera.get_processed_image()
-                    # img = Image.fromarray(img)
-                    # img.save("{}.png".format(pic_counter))
-                    # pic_counter += 1
-                else:
-                    success = self.__execute_command(step)
-            # update the progress bar
-            self.pub.publish(self.channel, {
-                'solve_button_locked': False,
-                'read_status': 100 * (idx + 1) / length,
-                'solve_status': 0
-            })
+        # place the labels of each photo where they are on the cube when it's oriented like at the beginning
+        # of the scan, so that they match the pattern imposed by muodov/kociemba's library: URFDLB.
+        rubiks_colors = cube.place_photos(np.empty((6*3*3, 3), dtype=np.uint8), orientations,
+                                          [numeric_face.reshape((3*3, 3)) for numeric_face in numeric_faces])
 
-        # reorder faces based on the current position of the rubik's cube
-        # after it has been rotated multiple times to scan its labels
-        # and also map the labels so that they match the pattern imposed
-        # by muodov/kociemba's library: URFDLB.
-        reoriented_faces = [
-            np.rot90(numeric_faces[1], k=2),  # rotate by 180 degrees
-            np.rot90(numeric_faces[0], k=1, axes=(0, 1)),  # rotate by 90 degrees anticlockwise
-            numeric_faces[5], # keep the same orientation
-            numeric_faces[3], # keep the same orientation
-            np.rot90(numeric_faces[2], k=1, axes=(1, 0)),  # rotate by 90 degrees clockwise
-            np.rot90(numeric_faces[4], k=2)  # rotate by 180 degrees
-        ]
-
-        # reshape the little bastard faces to be "fittable" by the KMeans algorithm
-        for i in range(6):
-            reoriented_faces[i] = reoriented_faces[i].reshape((3*3, 3))
-
-        # clusterize the labels on the rubik's cube
-        rubiks_colors = np.concatenate(reoriented_faces, axis=0)
-        kmeans = KMeans(n_clusters=6, n_init=50).fit(rubiks_colors)
-        rubiks_labels = kmeans.labels_
-
-        # get the cube's centers as numeric values
-        center_indexes = [4, 13, 22, 31, 40, 49] # cube centers when flattened
-        cube_centers = list(itemgetter(*center_indexes)(rubiks_labels))
-        labels_of_each_color = dict(Counter(rubiks_labels))
-
-        # calculate how many different colors there are on each face
-        # required for detecting if the cube is already solved
-        face_color_labels = [list(set(rubiks_labels[i * 9: (i + 1) * 9])) for i in range(6)]
-        face_labels_count = [len(x) for x in face_color_labels]
-
-        # check if each center has a different label
-        if len(set(cube_centers)) != 6:
-            self.cubesolution = None
-            logger.warning('didn\'t find the 6 cube centers of the rubik\'s cube. Cube centers are {}'.format(cube_centers))
-            # logger.debug(rubiks_labels.reshape((6,3,3)))
-
-        # check if there's an equal number of labels for each color of all six of them
-        elif len(set(labels_of_each_color.values())) != 1:
-            self.cubesolution = None
-            logger.warning('found a different number of labels for some centers off the cube. The number of labels that were detected are {}'.format(labels_of_each_color))
-            # logger.debug(rubiks_labels.reshape((6,3,3)))
-
-        # check if the cube is already solved
-        elif len(set(face_labels_count)) == 1:
-            self.cubesolution = []
-            logger.warning('the cube is already solved')
-
-        # if all tests from the above are a go then go and solve the cube
-        else:
-            self.cubesolution = self.__generate_handwritten_solution_from_cube_state(cube_centers, rubiks_labels)
-            logger.debug(self.cubesolution)
+        # the orientation of the cube (as indexed in cube.ORIENTATIONS)
+        # relative to the one it had at the beginning of the scan
+        orientation = orientations[-1]
+        for rescans in range(RESCAN_ATTEMPTS + 1):
+            # classify the labels on the rubik's cube, with 9 labels for each center's color
+            rubiks_labels, confidence = self.__classify_colors(rubiks_colors)
+
+            # get the cube's centers as numeric values
+            cube_centers = list(rubiks_labels[colors.CENTER_INDEXES])
+
+            # calculate how many different colors there are on each face
+            # required for detecting if the cube is already solved
+            face_color_labels = [list(set(rubiks_labels[i * 9: (i + 1) * 9])) for i in range(6)]
+            face_labels_count = [len(x) for x in face_color_labels]
+
+            # check if the cube is already solved
+            if set(face_labels_count) == {1}:
+                self.cubesolution = []
+                logger.warning('the cube is already solved')
+                break
+
+            # otherwise go and solve the cube
+            try:
+                self.cubesolution = self.__generate_handwritten_solution_from_cube_state(
+                    cube_centers, rubiks_labels, orientation)
+                logger.debug(self.cubesolution)
+                break
+            except ValueError as error:
+                # the labels don't make up a cube that can be solved
+                self.cubesolution = None
+                logger.warning('the labels that were detected don\'t make up a valid cube ({}). The labels are {}'.format(
+                    error, rubiks_labels.reshape((6, 9)).tolist()))
+            if rescans == RESCAN_ATTEMPTS:
+                break
+
+            # take new photos of only the faces with the most ambiguous labels instead of scanning the whole cube again
+            faces = colors.ambiguous_faces(confidence, RESCAN_CONFIDENCE)
+            logger.info('taking new photos of the {} faces'.format(', '.join(faces)))
+            self.generator.reset_arm_solution()
+            orientations = self.generator.scan_faces(faces, orientation)
+            self.__reset_counters()
+            numeric_faces = self.__take_photos(self.generator)
+            if numeric_faces is None:
+                return
+            self.__log_counters('rescanning')
+
+            # each photo replaces the labels that were on its face
+            rubiks_colors = cube.place_photos(rubiks_colors.copy(), orientations,
+                                              [numeric_face.reshape((3*3, 3)) for numeric_face in numeric_faces])
+            orientation = orientations[-1]
 
         # mark the end of the thread
         self.thread_stopper.set()
@@ -863,25 +1108,46 @@ class RubiksSolver():
         # generator = arms.ArmSolutionGenerator(*robot_arms)
         generator = self.generator
         generator.reset_arm_solution()
-        generator.solution(self.cubesolution)
 
-        # get the generated sequence
-        sequence = generator.arms_solution
+        # the arms' solution of a cube that has been seen before is taken as it was compiled then
+        setup = self.__arms_setup(generator)
+        stream = self.solutions.stream(self.cubestate, setup)
+        if stream is None:
+            generator.solution(self.cubesolution)
+            removed_steps, removed_time = generator.optimize()
+            logger.info('optimized away {} steps and {:.2f} seconds from the solution'.format(removed_steps, removed_time))
+
+            # get the generated sequence with the independent steps running concurrently
+            # and compile it ahead of time into the register writes of the PivotPi
+            timeline = generator.compile_timeline()
+            logger.debug('compiled {} steps into {} groups'.format(sum(len(steps) for steps, _ in timeline), len(timeline)))
+            sequence = generator.flatten_timeline(timeline)
+            stream = pp.compile_stream(sequence)
+            self.solutions.put_stream(self.cubestate, setup, stream)
+        else:
+            logger.info('took the compiled solution from the solution cache')
 
-        # solve the rubik's cube by actuating the arms
-        length = len(sequence)
-        for idx, step in enumerate(sequence):
-            if self.thread_stopper.is_set():
-                return
-            if step:
-                logger.debug('Execute \'' + str(step) + '\'')
-                success = self.__execute_command(step)
+        def progress(idx):
             self.pub.publish(self.channel, {
                 'solve_button_locked': False,
                 'read_status': 100,
-                'solve_status':  100 * (idx + 1) / length
+                'solve_status':  100 * (idx + 1) / len(stream)
             })
-            idx += 1
+
+        # solve the rubik's cube by actuating the arms
+        self.__reset_counters()
+        run = executor.execute(pivotpi, stream, self.thread_stopper, progress)
+        if run.error is not None:
+            logger.error(run.error)
+        elif not self.thread_stopper.is_set() and self.scan is not None:
+            # the cube got solved, so its colors were read right
+            self.__calibrate_colors()
+        self.__log_counters('solving')
+        logger.info('solving: {max_lateness:.4f} seconds late at most and {mean_lateness:.4f} seconds on average'.format(
+            **run.report()))
+
+        # the arms are done, so the solution cache can be saved without holding them back
+        td.Thread(target=self.__save_solutions, name='Solution Cache').start()
 
         self.thread_stopper.set()
 
@@ -898,7 +1164,11 @@ class RubiksSolver():
             action = event.kwargs.get('action')
 
             # instantiate arms and reposition
-            robot_arms = self.__instantiate_arms_in_release_mode(config)
+            try:
+                robot_arms = self.__instantiate_arms_in_release_mode(config)
+            except ValueError as error:
+                logger.error(error)
+                return
             generator = arms.ArmSolutionGenerator(*robot_arms)
             generator.reposition_arms(delay=1.0)
 
@@ -907,11 +1177,10 @@ class RubiksSolver():
             elif action == 'release':
                 generator.release()
 
-            sequence = generator.arms_solution
-            for step in sequence:
-                if step:
-                    logger.debug(step)
-                    success = self.__execute_command(step)
+            sequence = generator.flatten_timeline(generator.compile_timeline())
+            run = executor.execute(pivotpi, pp.compile_stream(sequence))
+            if run.error is not None:
+                logger.error(run.error)
 
         elif cmd_type == 'servo':
             servo = int(event.kwargs.get('servo'))
@@ -920,7 +1189,7 @@ class RubiksSolver():
             low = config['servos'][servo_name]['low']
             high = config['servos'][servo_name]['high']
             pos = low + (high - low) * pos_percent / 100
-            pivotpi.angle(servo, pos)
+            pivotpi.set_frame({servo: pos})
             
 
 if __name__ == '__main__':
@@ -939,10 +1208,15 @@ if __name__ == '__main__':
 
     queues = {}
     config_file = 'config.json'
-    camera = PiCameraPhotos()
+    with open(config_file, 'r') as f:
+        hardware_config = json.load(f)
+    backend = hardware.get_backend(hardware_config)
+    hardware.instrument_i2c(hardware_config)
+    logger.info('running on the \'{}\' backend'.format(backend))
+    camera = PiCameraPhotos(hardware.get_camera(backend, hardware_config))
     stop_event = td.Event()
 
-    pivotpi = pp.PivotPi()
+    pivotpi = hardware.get_pivotpi(backend)
 
 
     def fsm_runner():
@@ -981,15 +1255,17 @@ if __name__ == '__main__':
                         else:
                             logger.info('save/load button pressed, but not updating the solver configs because it\'s in rest state')
                     elif channel == 'solver':
-                        msg = message.lower()
+                        # the label of the button and the time it got pressed at
+                        label, pressed = message
+                        msg = label.lower()
                         if 'read cube' == msg:
                             rubiks.read(config=config) # change state here
                         elif 'solve cube' == msg:
                             rubiks.solve() # change state here
                         elif 'stop' == msg:
-                            rubiks.stop(hard=False) # change state here
+                            rubiks.stop(hard=False, pressed=pressed) # change state here
                         elif 'cut power' == msg:
-                            rubiks.stop(hard=True) # change state here
+                            rubiks.stop(hard=True, pressed=pressed) # change state here
                         elif 'fix' == msg:
                             rubiks.command(config=config, type='system', action='fix') # reflexive state here
                         elif 'release' == msg:
@@ -30,6 +30,90 @@ def translate(value, leftMin, leftMax, rightMin, rightMax):
     # Convert the 0-1 range into a value in the right range.
     return int(rightMin + (valueScaled * rightSpan))
 
+#map an angle of 0-180 to the value of the PWM register that ends the servo's pulse
+def angle_to_pwm(angle, servo_min=150, servo_max=600):
+    return 4095 - translate(angle, 0, 180, servo_min, servo_max)
+
+#split the ON/OFF values of a channel into the bytes of its 4 registers
+def pwm_bytes(on, off):
+    return [on & 0xFF, on >> 8, off & 0xFF, off >> 8]
+
+#the register bytes for each whole angle of 0-180
+def build_lut(servo_min=150, servo_max=600):
+    return [pwm_bytes(0, angle_to_pwm(angle, servo_min, servo_max)) for angle in range(181)]
+
+def compile_stream(program, luts=None, frames=True):
+    """
+    Compiles a list of steps into a stream of records that can be played back without computing anything.
+
+    :param program: List of arms.Step objects. Only servo steps can be streamed.
+    :param luts: A lookup table for each of the 8 servos as returned by build_lut. Defaults to
+        the tables of PivotPi.servo_min/servo_max.
+    :param frames: Whether the servo steps that are issued at once (the ones with no wait after them, up to
+        the one that has the wait) are merged into frames. A frame is written in a single block write over
+        consecutive registers, so all of its servos start moving together. The channels in between that
+        aren't part of the frame get the bytes they were last given in the stream and if they haven't been
+        given any yet, their bytes are None, so that PCA9685.set_pwm_registers keeps what their registers hold.
+    :return: A list of (channel, register, data, wait) tuples: the (first) servo's channel, its first register,
+        the bytes to write from there on and the time to wait afterwards.
+    """
+    if luts is None:
+        luts = [build_lut(PivotPi.servo_min, PivotPi.servo_max)] * 8
+
+    stream = []
+    # the bytes each channel was last given in the stream
+    written = {}
+    # the servo steps that wait to be written as a frame
+    frame = {}
+    for step in program:
+        if step is None:
+            continue
+        if step.channel is None:
+            raise ValueError('{} steps can\'t be streamed'.format(step.opcode.name))
+        if step.channel < 0 or step.channel > 7 or step.position < 0 or step.position > 180:
+            raise ValueError('{} is out of range'.format(step))
+
+        if step.position == int(step.position):
+            data = luts[step.channel][int(step.position)]
+        else:
+            data = pwm_bytes(0, angle_to_pwm(step.position, PivotPi.servo_min, PivotPi.servo_max))
+
+        if not frames:
+            stream.append((step.channel, PCA9685.LED0_ON_L + 4 * step.channel, data, step.time))
+            continue
+        frame[step.channel] = data
+        if step.time > 0.0:
+            stream += frame_records(frame, written, step.time)
+            frame = {}
+
+    stream += frame_records(frame, written)
+    return stream
+
+def frame_records(frame, written, wait=0.0):
+    """
+    Turns a frame into the record of a stream.
+
+    :param frame: Dictionary mapping each channel to the 4 bytes of its registers.
+    :param written: Dictionary with the bytes each channel was last given. It gets updated with the frame.
+    :param wait: The time to wait after the frame.
+    :return: A list with a (channel, register, data, wait) tuple or an empty list if the frame is empty.
+    """
+    if not frame:
+        return []
+
+    # the channels in between whose bytes aren't known keep what their registers hold
+    first = min(frame)
+    data = []
+    for channel in range(first, max(frame) + 1):
+        if channel in frame:
+            data.extend(frame[channel])
+        elif channel in written:
+            data.extend(written[channel])
+        else:
+            data.extend([None] * 4)
+    written.update(frame)
+    return [(first, PCA9685.LED0_ON_L + 4 * first, data, wait)]
+
 class PivotPi(object):
     servo_controller=None
     addr_00=0x40
@@ -41,9 +125,11 @@ class PivotPi(object):
     servo_min = 150  # Min pulse length out of 4096
     servo_max = 600  # Max pulse length out of 4096
     frequency = 60;
-    def __init__(self, addr = 0x40, actual_frequency = 60):# Set the address and optionally the PWM frequency, which should be 60Hz, but can be off by at least 5%. One measures at about 59.1, one at about 60.1, and one at about 63.5Hz.
+    seconds_saved = 0.0
+    def __init__(self, addr = 0x40, actual_frequency = 60, **kwargs):# Set the address and optionally the PWM frequency, which should be 60Hz, but can be off by at least 5%. One measures at about 59.1, one at about 60.1, and one at about 63.5Hz.
+        # kwargs go to I2C.get_i2c_device, like busnum and i2c_interface to run on another bus
         try:
-            self.servo_controller = PCA9685.PCA9685(address=addr)
+            self.servo_controller = PCA9685.PCA9685(address=addr, **kwargs)
             self.frequency = actual_frequency;
             
             # Set frequency to 60hz, good for servos.
@@ -61,14 +147,75 @@ class PivotPi(object):
     
     def angle(self, channel, angle):
         if angle >= 0 and angle <= 180 and channel >= 0 and channel <= 7:
-            pwm_to_send = 4095 - translate(angle, 0, 180, self.servo_min, self.servo_max)
+            pwm_to_send = angle_to_pwm(angle, self.servo_min, self.servo_max)
             try:
                 self.servo_controller.set_pwm(channel, 0, int(pwm_to_send))
                 return 1
             except:
                 raise IOError("PivotPi not connected")
         return -1
+
+    def set_frame(self, frame):
+        """
+        Moves many servos at once: the frame is written in a single block write over the registers of its
+        channels, the same way compile_stream writes its frames, so the outputs of all of them change together.
+
+        :param frame: Dictionary mapping each channel (0-7) to the angle (0-180) of its servo.
+        :return: 1 if the frame got written or -1 if a channel or an angle is out of range.
+        """
+        values = {}
+        for channel, angle in frame.items():
+            if angle < 0 or angle > 180 or channel < 0 or channel > 7:
+                return -1
+            values[channel] = pwm_bytes(0, angle_to_pwm(angle, self.servo_min, self.servo_max))
+        try:
+            for channel, register, data, wait in frame_records(values, {}):
+                self.servo_controller.set_pwm_registers(register, data)
+            return 1
+        except:
+            raise IOError("PivotPi not connected")
     
+    def skip(self, seconds):
+        """
+        Accounts for a wait that got skipped because the servos it was meant for didn't have to move.
+
+        :param seconds: The skipped wait.
+        :return: Nothing.
+        """
+        self.seconds_saved += seconds
+
+    def reset_counters(self):
+        """
+        Sets the counters of the written/skipped writes and of the skipped waits back to 0. Call it at the start of a run.
+
+        :return: Nothing.
+        """
+        self.servo_controller.reset_counters()
+        self.seconds_saved = 0.0
+
+    def counters(self):
+        """
+        Gets the counters of the current run.
+
+        :return: A dictionary with the 'writes', 'skipped_writes' and 'seconds_saved' keys.
+        """
+        return {
+            'writes': self.servo_controller.writes,
+            'skipped_writes': self.servo_controller.skipped_writes,
+            'seconds_saved': self.seconds_saved
+        }
+
+    def cut_power(self):
+        """
+        Releases all servos at once with a single broadcast write, the same way angle_microseconds does for a single one.
+
+        :return: Nothing.
+        """
+        try:
+            self.servo_controller.set_all_full_on()
+        except:
+            raise IOError("PivotPi not connected")
+
     def angle_microseconds(self, channel, time):
         if channel >= 0 and channel <= 7:
             try:
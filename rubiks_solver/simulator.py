@@ -0,0 +1,161 @@
+import logging
+import json
+import sys
+import arms
+
+logger = logging.getLogger(__name__)
+
+class Simulator:
+    def __init__(self, generator):
+        """
+        Create an object that replays arms' solutions on a virtual clock instead of on the robot.
+
+        :param generator: An instance of arms.ArmSolutionGenerator. Its arms give the servo speeds/positions and
+            the position in which they were when its solution was reset is where the replay starts from.
+        """
+        self.generator = generator
+        self.arm_names = {
+            'down': generator.down,
+            'left': generator.left,
+            'up': generator.up,
+            'right': generator.right
+        }
+
+    def run(self, program=None):
+        """
+        Replays a list of steps: each step is issued at the current time of the virtual clock, its servo
+        gets busy for as long as it physically needs to get to its position and then the clock advances
+        by the step's time. Steps that don't move a servo only advance the clock by their time.
+
+        :param program: List of steps as executed on the robot. Defaults to the generated arms' solution.
+        :return: A dictionary with the following keys:
+            'duration' - seconds until the last step is issued and all servos are done moving.
+            'busy' - dictionary mapping each servo to the list of (start, end) intervals in which it moves.
+            'utilization' - dictionary mapping each arm (down/left/up/right) to the fraction of the duration in
+            which at least one of its servos moves.
+            'overlaps' - the number of steps issued to a servo that was still moving.
+            'critical_path' - the steps of the longest chain of dependent steps in the program.
+            'critical_duration' - how long the critical path takes in seconds, which is as fast as the
+            program can get by running its independent steps concurrently.
+        """
+        if program is None:
+            program = self.generator.arms_solution
+
+        positions = {}
+        busy = {}
+        for arm, (linear, rotational) in self.generator.initial_positions.items():
+            positions[arm.linear_servo] = linear
+            positions[arm.rotational_servo] = rotational
+            busy[arm.linear_servo] = []
+            busy[arm.rotational_servo] = []
+
+        clock = 0.0
+        overlaps = 0
+        for step in program:
+            if step is None:
+                continue
+
+            servo = step.servo
+            if step.opcode == arms.Opcode.SERVO and step.position != positions[servo]:
+                intervals = busy[servo]
+                if intervals and intervals[-1][1] > clock:
+                    # the servo gets redirected before getting to its previous position
+                    overlaps += 1
+                    intervals[-1] = (intervals[-1][0], clock)
+                intervals.append((clock, clock + self.generator.servo_travel_time(step, positions[servo])))
+                positions[servo] = step.position
+
+            clock += step.time
+
+        duration = clock
+        for intervals in busy.values():
+            if intervals:
+                duration = max(duration, intervals[-1][1])
+
+        utilization = {}
+        for name, arm in self.arm_names.items():
+            moving = self.__union(busy[arm.linear_servo] + busy[arm.rotational_servo])
+            utilization[name] = moving / duration if duration > 0.0 else 0.0
+
+        critical_path, critical_duration = self.critical_path(program)
+
+        return {
+            'duration': duration,
+            'busy': busy,
+            'utilization': utilization,
+            'overlaps': overlaps,
+            'critical_path': critical_path,
+            'critical_duration': critical_duration
+        }
+
+    def critical_path(self, program=None):
+        """
+        Finds the longest chain of dependent steps in a program, using the same dependencies
+        as the ones used to compile the arms' solution into a timeline.
+
+        :param program: List of steps. Defaults to the generated arms' solution.
+        :return: A tuple with the list of steps on the critical path and its duration in seconds.
+        """
+        nodes = self.generator.dependency_graph(program)
+        if not nodes:
+            return [], 0.0
+
+        # as soon as possible finish time of each node and the dependency that held it back the most
+        finish = []
+        blocker = []
+        for node in nodes:
+            previous = max(node['deps'], key=lambda dep: finish[dep], default=None)
+            start = finish[previous] if previous is not None else 0.0
+            finish.append(start + node['duration'])
+            blocker.append(previous)
+
+        idx = max(range(len(nodes)), key=lambda idx: finish[idx])
+        duration = finish[idx]
+        chain = []
+        while idx is not None:
+            chain.append(nodes[idx])
+            idx = blocker[idx]
+        chain.reverse()
+
+        return [step for node in chain for step in node['steps']], duration
+
+    @staticmethod
+    def __union(intervals):
+        """
+        Computes how much time a list of intervals covers.
+
+        :param intervals: List of (start, end) tuples.
+        :return: The covered time in seconds.
+        """
+        covered = 0.0
+        end = None
+        for start, stop in sorted(intervals):
+            if end is None or start > end:
+                covered += stop - start
+                end = stop
+            elif stop > end:
+                covered += stop - end
+                end = stop
+        return covered
+
+if __name__ == '__main__':
+    # usage: python simulator.py "R U R' U'" [config.json]
+    logging.basicConfig(level=logging.INFO, format='%(levelname)2s %(name)s | %(message)s')
+
+    moves = sys.argv[1].split()
+    config_file = sys.argv[2] if len(sys.argv) > 2 else 'config.json'
+    with open(config_file, 'r') as f:
+        config = json.load(f)
+
+    generator = arms.ArmSolutionGenerator(*arms.instantiate_arms(config, 'release'), lazy_regrip=True)
+    generator.solution(moves)
+    generator.optimize()
+    simulator = Simulator(generator)
+
+    for name, program in [('sequential', generator.arms_solution),
+                          ('concurrent', generator.flatten_timeline(generator.compile_timeline()))]:
+        report = simulator.run(program)
+        logger.info('{}: {:.2f} seconds, critical path of {} steps and {:.2f} seconds, {} overlaps'.format(
+            name, report['duration'], len(report['critical_path']), report['critical_duration'], report['overlaps']))
+        logger.info('{}: utilization {}'.format(name, ', '.join(
+            '{} {:.0%}'.format(arm, value) for arm, value in report['utilization'].items())))
@@ -0,0 +1,126 @@
+import logging
+import gzip
+import json
+import threading
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+class SolutionCache(object):
+    def __init__(self, capacity=256):
+        """
+        Create a least-recently-used cache of the solutions of cube states. Each entry holds the moves of
+        a state and optionally the stream the arms' solution of those moves compiles to, together with
+        the setup of the arms it was compiled for, so a cube that has been seen before needs neither to be
+        solved nor to have its arms' solution planned again. It can be saved from another thread while it's used.
+
+        :param capacity: The most states that are kept. Once there are more, the least recently used one is dropped.
+        """
+        self.capacity = capacity
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    @classmethod
+    def load(cls, path, capacity=256):
+        """
+        Loads a cache from disk.
+
+        :param path: Path to the gzipped JSON file of the cache.
+        :param capacity: The most states that are kept.
+        :return: The loaded cache or an empty one if there's no (valid) file.
+        """
+        cache = cls(capacity)
+        try:
+            with gzip.open(path, 'rt') as f:
+                entries = json.load(f)
+            for cubestate, moves, setup, stream in entries[-capacity:]:
+                if stream is not None:
+                    stream = [tuple(record) for record in stream]
+                cache.entries[cubestate] = (moves, setup, stream)
+        except (IOError, OSError, EOFError, ValueError, TypeError) as error:
+            logger.info('starting with an empty solution cache ({})'.format(error))
+        return cache
+
+    def save(self, path):
+        """
+        Saves the cache to disk, from the least to the most recently used state.
+
+        :param path: Path to the gzipped JSON file of the cache.
+        :return: Nothing.
+        """
+        # the entries are never changed, only replaced, so they can be written once they're listed
+        with self.lock:
+            entries = [[cubestate, moves, setup, stream] for cubestate, (moves, setup, stream) in self.entries.items()]
+        with gzip.open(path, 'wt') as f:
+            json.dump(entries, f, separators=(',', ':'))
+
+    def get(self, cubestate):
+        """
+        Looks up the solution of a cube state and counts it as a hit or a miss.
+
+        :param cubestate: 54-character string of URFDLB labels as expected by the muodov/kociemba library.
+        :return: List of moves in handwritten notation (like "U", "R'" or "F2") or None if the state isn't cached.
+        """
+        with self.lock:
+            if cubestate not in self.entries:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.entries.move_to_end(cubestate)
+            return list(self.entries[cubestate][0])
+
+    def put(self, cubestate, moves):
+        """
+        Caches the solution of a cube state, which makes it the most recently used one.
+
+        :param cubestate: 54-character string of URFDLB labels as expected by the muodov/kociemba library.
+        :param moves: List of moves in handwritten notation (like "U", "R'" or "F2").
+        :return: Nothing.
+        """
+        with self.lock:
+            entry = self.entries.pop(cubestate, None)
+            if entry is not None and entry[0] == list(moves):
+                self.entries[cubestate] = entry
+                return
+            self.entries[cubestate] = (list(moves), None, None)
+            while len(self.entries) > self.capacity:
+                self.entries.popitem(last=False)
+
+    def stream(self, cubestate, setup):
+        """
+        Looks up the compiled arms' solution of a cube state. It isn't counted as a hit or a miss.
+
+        :param cubestate: 54-character string of URFDLB labels as expected by the muodov/kociemba library.
+        :param setup: Short string that identifies the arms the stream has to be compiled for.
+        :return: The stream as returned by pivotpi.compile_stream or None if there isn't one for the setup.
+        """
+        with self.lock:
+            entry = self.entries.get(cubestate)
+        if entry is None or entry[1] != setup:
+            return None
+        return entry[2]
+
+    def put_stream(self, cubestate, setup, stream):
+        """
+        Caches the compiled arms' solution of a cube state whose moves are cached.
+
+        :param cubestate: 54-character string of URFDLB labels as expected by the muodov/kociemba library.
+        :param setup: Short string that identifies the arms the stream got compiled for.
+        :param stream: The stream as returned by pivotpi.compile_stream.
+        :return: Nothing.
+        """
+        with self.lock:
+            if cubestate in self.entries:
+                self.entries[cubestate] = (self.entries[cubestate][0], setup, list(stream))
+
+    def counters(self):
+        """
+        :return: A dictionary with the number of 'hits', 'misses' and 'entries' of the cache.
+        """
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'entries': len(self.entries)
+        }
@@ -0,0 +1,44 @@
+import logging
+import time
+import kociemba
+import cube
+
+logger = logging.getLogger(__name__)
+
+def fastest_solution(generator, cubestate, orientations=len(cube.ORIENTATIONS), time_budget=None):
+    """
+    Finds the solution the robot executes the fastest. The muodov/kociemba library only goes for the least number of
+    moves, which doesn't say much about how long the arms take: F/B moves require the whole cube to be rotated
+    and turning the down face requires regripping the cube. So the cube is virtually rotated into each of the 24
+    whole-cube orientations, a solution is found for each of them and the one with the lowest estimated arm time wins.
+
+    :param generator: An instance of arms.ArmSolutionGenerator with the arms in the position from which the solution starts.
+        The generator is left untouched.
+    :param cubestate: 54-character string of URFDLB labels as expected by the muodov/kociemba library.
+    :param orientations: How many of the 24 orientations to try. The identity orientation is always tried first.
+    :param time_budget: Optional number of seconds after which no more orientations are tried.
+    :return: List of moves in handwritten notation (like "U", "R'" or "F2") for the cube as it is.
+    """
+    start = time.time()
+    best_solution = None
+    best_time = None
+    identity_time = None
+
+    for matrix in cube.ORIENTATIONS[:orientations]:
+        if best_solution is not None and time_budget is not None and time.time() - start > time_budget:
+            break
+
+        solution = kociemba.solve(cube.rotate_state(cubestate, matrix)).split(' ')
+        solution = cube.rotate_moves(solution, matrix)
+        estimated_time = generator.estimate_time(solution)
+
+        if identity_time is None:
+            identity_time = estimated_time
+        if best_time is None or estimated_time < best_time:
+            best_solution = solution
+            best_time = estimated_time
+
+    logger.info('picked a solution of {} moves and {:.2f} seconds instead of {:.2f} seconds in {:.2f} seconds'.format(
+        len(best_solution), best_time, identity_time, time.time() - start))
+
+    return best_solution
@@ -0,0 +1,115 @@
+import json
+import pytest
+import os
+import arms
+import cube
+
+CONFIG_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'config.json')
+
+def scan_generator():
+    """
+    Creates a generator with the arms where they are when the cube gets scanned, like readcube_thread does.
+
+    :return: An instance of arms.ArmSolutionGenerator.
+    """
+    with open(CONFIG_FILE, 'r') as f:
+        config = json.load(f)
+    robot_arms = arms.instantiate_arms(config, 'release')
+    generator = arms.ArmSolutionGenerator(*robot_arms)
+    generator.reposition_arms(delay=1.0)
+    generator.fix()
+    return arms.ArmSolutionGenerator(*robot_arms)
+
+def test_scan_tour_and_rescan_share_the_frame():
+    generator = scan_generator()
+    orientations = generator.scan_faces()
+
+    # the tour takes a photo of each face of the cube as it's oriented at the beginning of the scan
+    centers = [cube.place_photos([None] * 54, [orientation], [range(9)]).index(4) for orientation in orientations]
+    assert sorted(centers) == [9 * idx + 4 for idx in range(6)]
+    photos = [step for step in generator.arms_solution if step is not None and step.opcode == arms.Opcode.PHOTO]
+    assert len(photos) == 6
+
+    # a rescan that starts where the scan ended names the faces in the same frame
+    generator.reset_arm_solution()
+    rescans = generator.scan_faces('UB', orientations[-1])
+    placed = cube.place_photos([None] * 54, rescans, [['seen'] * 9] * len(rescans))
+    assert [facelet for facelet, item in enumerate(placed) if item is not None] == \
+        list(range(0, 9)) + list(range(45, 54))
+
+def test_double_position_out_of_range_is_a_config_error():
+    with open(CONFIG_FILE, 'r') as f:
+        config = json.load(f)
+    config['servos']['s2']['double'] = 200
+
+    with pytest.raises(ValueError, match='s2'):
+        arms.instantiate_arms(config, 'release')
+
+def solve_generator(moves="R U' F2 L D' B R2 U F' D2 L' B2", lazy_regrip=False):
+    """
+    Creates a generator with the arms' solution of a scan followed by the solution of a cube.
+
+    :param moves: The moves of the cube's solution in handwritten notation.
+    :param lazy_regrip: Whether the solution is generated in the lazy regrip mode. Without it,
+        the arms regrip the cube after each turn, which leaves optimize more to cancel.
+    :return: An instance of arms.ArmSolutionGenerator.
+    """
+    generator = scan_generator()
+    generator.scan_faces()
+    generator.lazy_regrip = lazy_regrip
+    generator.solution(moves.split())
+    return generator
+
+def servo_positions(program):
+    """
+    Follows the servos throughout a list of steps.
+
+    :param program: A list of steps.
+    :return: A list with a dictionary mapping each servo that has moved so far to its position, taken at each photo and at the end.
+    """
+    positions = {}
+    snapshots = []
+    for step in program:
+        if step is None:
+            continue
+        if step.opcode == arms.Opcode.PHOTO:
+            snapshots.append(dict(positions))
+        else:
+            positions[step.servo] = step.position
+    return snapshots + [positions]
+
+def test_optimize_keeps_the_photos_and_the_positions_they_are_taken_at():
+    generator = solve_generator()
+    program = [step for step in generator.arms_solution if step is not None]
+    removed, saved = generator.optimize()
+    optimized = generator.arms_solution
+    assert len(optimized) < len(program) and saved > 0.0
+
+    photos = [step for step in program if step.opcode == arms.Opcode.PHOTO]
+    assert [step for step in optimized if step.opcode == arms.Opcode.PHOTO] == photos
+    assert servo_positions(optimized) == servo_positions(program)
+
+    # the steps that are left on each servo still come in the same order
+    for servo in generator.servos:
+        moves = [step.position for step in program if step.servo == servo]
+        left = iter(moves)
+        assert all(any(position == move for move in left) for position in
+                   [step.position for step in optimized if step.servo == servo])
+
+@pytest.mark.parametrize('lazy_regrip', [False, True])
+def test_compile_timeline_keeps_every_step_in_order(lazy_regrip):
+    generator = solve_generator(lazy_regrip=lazy_regrip)
+    generator.optimize()
+    program = list(generator.arms_solution)
+    timeline = generator.compile_timeline()
+    flattened = [step for steps, _ in timeline for step in steps]
+
+    assert sorted(map(id, flattened)) == sorted(map(id, program))
+    for servo in generator.servos:
+        assert [step for step in flattened if step.servo == servo] == [step for step in program if step.servo == servo]
+    assert servo_positions(flattened) == servo_positions(program)
+
+    # a photo is taken on its own, once everything before it is done
+    for steps, wait in timeline:
+        if any(step.opcode == arms.Opcode.PHOTO for step in steps):
+            assert len(steps) == 1
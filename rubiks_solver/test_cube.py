@@ -0,0 +1,101 @@
+import numpy as np
+import cube
+
+# the whole-cube rotations of the arms' macros
+MACROS = {
+    'rotate_cube_towards_right': cube.face_rotation('U'),
+    'rotate_cube_upwards': cube.face_rotation('R')
+}
+
+# the scan the robot used to do, with a photo before each None
+BASELINE_SCAN = [None, 'rotate_cube_towards_right', None, 'rotate_cube_towards_right', None,
+                 'rotate_cube_towards_right', None, 'rotate_cube_upwards', None,
+                 'rotate_cube_upwards', 'rotate_cube_upwards', None]
+
+def photo_matrices(scan):
+    """
+    Tracks the orientation of the cube throughout a scan.
+
+    :param scan: List of macro names, with None for the photos.
+    :return: A list with the rotation matrix of the cube relative to the beginning of the scan at each photo.
+    """
+    matrix = cube.IDENTITY
+    matrices = []
+    for macro in scan:
+        if macro is None:
+            matrices.append(matrix)
+        else:
+            matrix = cube.multiply(MACROS[macro], matrix)
+    return matrices
+
+def baseline_placement(photos):
+    """
+    Places six photos like the robot did before the scans got planned: the faces are named as
+    the cube is oriented at the end of the scan and each photo is turned into place by hand.
+
+    :param photos: Six 3x3 numpy arrays.
+    :return: A numpy array with the 54 facelets in URFDLB order.
+    """
+    reoriented_faces = [
+        np.rot90(photos[1], k=2),
+        np.rot90(photos[0], k=1, axes=(0, 1)),
+        photos[5],
+        photos[3],
+        np.rot90(photos[2], k=1, axes=(1, 0)),
+        np.rot90(photos[4], k=2)
+    ]
+    return np.concatenate([face.reshape(9) for face in reoriented_faces])
+
+def test_place_photos_of_the_baseline_scan():
+    # each item tells which photo and which of its labels it is
+    photos = [np.arange(9 * idx, 9 * (idx + 1)).reshape((3, 3)) for idx in range(6)]
+    expected = baseline_placement(photos)
+
+    # the orientations are relative to the end of the scan, which is what the baseline names the faces after
+    matrices = photo_matrices(BASELINE_SCAN)
+    end = cube.transpose(matrices[-1])
+    orientations = [cube.ORIENTATION_INDEXES[cube.multiply(matrix, end)] for matrix in matrices]
+    placed = cube.place_photos([None] * 54, orientations, [photo.reshape(9) for photo in photos])
+
+    assert placed == expected.tolist()
+
+def test_rescan_overwrites_the_facelets_of_its_face():
+    photos = [np.arange(9 * idx, 9 * (idx + 1)).reshape((3, 3)) for idx in range(6)]
+    placed = baseline_placement(photos).tolist()
+
+    # right after the scan, a new photo of the front face only replaces the front face
+    rescanned = cube.place_photos(list(placed), [0], [list(range(100, 109))])
+    assert rescanned[18:27] == list(range(100, 109))
+    assert rescanned[:18] + rescanned[27:] == placed[:18] + placed[27:]
+
+    # and turning the cube upwards brings the down face under the camera
+    rescanned = cube.place_photos(list(placed), [cube.ORIENTATION_INDEXES[MACROS['rotate_cube_upwards']]],
+                                  [placed[27:36]])
+    assert rescanned == placed
+
+def scrambled_cube(moves="R U' F2 L D' B R2 U F' D2 L' B2"):
+    """
+    :param moves: The moves that scramble the cube, in handwritten notation.
+    :return: 54-character string of URFDLB labels of a solved cube after the moves.
+    """
+    cubestate = ''.join(face * 9 for face in cube.FACES)
+    for move in moves.split():
+        cubestate = cube.apply_move(cubestate, move)
+    return cubestate
+
+def test_scan_frame_only_renames_the_baseline_state():
+    # what the camera saw during the baseline scan of a cube named as it's oriented at the end of the scan
+    cubestate = scrambled_cube()
+    indexes = baseline_placement([np.arange(9 * idx, 9 * (idx + 1)).reshape((3, 3)) for idx in range(6)])
+    photos = [[None] * 9 for _ in range(6)]
+    for facelet, item in enumerate(indexes):
+        photos[item // 9][item % 9] = cubestate[facelet]
+
+    # placed with the orientations relative to the beginning of the scan, the state is named after the cube
+    # as it was oriented then, so it has to be rotated into the orientation the scan leaves the cube in
+    matrices = photo_matrices(BASELINE_SCAN)
+    orientations = [cube.ORIENTATION_INDEXES[matrix] for matrix in matrices]
+    placed = ''.join(cube.place_photos([None] * 54, orientations, photos))
+
+    assert placed != cubestate
+    assert cube.rotate_state(placed, cube.ORIENTATIONS[orientations[-1]]) == cubestate
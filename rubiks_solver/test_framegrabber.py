@@ -0,0 +1,22 @@
+import pytest
+import framegrabber
+
+def test_copy_leaves_the_grabbed_frame_alone():
+    grabber = framegrabber.FrameGrabber((32, 16), buffers=3)
+    with pytest.raises(IOError):
+        grabber.copy(timeout=0.0)
+
+    grabber.write(bytes([1]) * grabber.frame_size)
+    img = grabber.grab()
+    copied = grabber.copy()
+    assert grabber.reading == grabber.latest
+    assert (copied == 1).all()
+
+    # the copy of a newer frame neither takes the grabbed buffer nor changes with the ring
+    grabber.write(bytes([2]) * grabber.frame_size)
+    copied = grabber.copy()
+    grabber.write(bytes([3]) * grabber.frame_size)
+    assert (img == 1).all()
+    assert (copied == 2).all()
+    grabber.release()
+    assert grabber.reading is None
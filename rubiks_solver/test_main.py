@@ -0,0 +1,63 @@
+import logging
+import json
+import os
+import transitions
+from PIL import Image, ImageDraw
+import hardware
+import main
+
+CONFIG_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'config.json')
+
+# the RGB color of each face of the cube
+FACE_COLORS = [(250, 250, 250), (220, 30, 30), (30, 180, 60), (240, 220, 20), (250, 130, 20), (20, 60, 220)]
+
+def solved_cube_photos(directory, camera):
+    """
+    Draws the photos of a solved cube - each face has the 9 labels of its own color.
+
+    :param directory: The directory the photos are saved into.
+    :param camera: The 'camera' section of the configuration.
+    :return: Nothing.
+    """
+    xoff, yoff = camera['X Offset (px)'], camera['Y Offset (px)']
+    dim, pad = camera['Size (px)'], camera['Pad (px)']
+    for face, color in enumerate(FACE_COLORS):
+        img = Image.new('RGB', (480, 360), (10, 10, 10))
+        draw = ImageDraw.Draw(img)
+        for row in range(3):
+            for col in range(3):
+                x = xoff + col * (dim + pad) + dim // 2
+                y = yoff + row * (dim + pad) + dim // 2
+                draw.rectangle([x - 20, y - 20, x + 20, y + 20], fill=color)
+        img.save(os.path.join(directory, '{}.png'.format(face)))
+
+def test_stop_on_already_solved_cube(tmp_path, monkeypatch):
+    with open(CONFIG_FILE, 'r') as f:
+        config = json.load(f)
+    solved_cube_photos(str(tmp_path), config['camera'])
+    # keep the calibration and the solution cache out of the repository
+    monkeypatch.chdir(str(tmp_path))
+
+    # the globals the FSM's model expects
+    main.logger = logging.getLogger('main')
+    main.queues = {}
+    main.camera = main.PiCameraPhotos(hardware.get_camera('sim', dict(config, images=str(tmp_path))))
+    main.pivotpi = hardware.get_pivotpi('sim')
+
+    rubiks = main.RubiksSolver('update')
+    machine = transitions.Machine(model=rubiks, states=['rest', 'reading', 'solving'], initial='rest', send_event=True)
+    machine.add_transition(trigger='read', source='rest', dest='reading', after='readcube')
+    machine.add_transition(trigger='stop', source='*', dest='rest', after='block_solve')
+    updates = main.QueuePubSub(main.queues).subscribe('update')
+
+    # the read thread finds the cube solved and stops the FSM from within itself
+    rubiks.read(config=config)
+    rubiks.thread.join(60.0)
+    assert not rubiks.thread.is_alive()
+    assert rubiks.cubesolution == []
+    assert rubiks.state == 'rest'
+
+    messages = []
+    while not updates.empty():
+        messages.append(updates.get())
+    assert messages[-1] == {'solve_button_locked': True, 'read_status': 0, 'solve_status': 0}
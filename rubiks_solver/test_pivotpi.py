@@ -0,0 +1,59 @@
+import pytest
+import arms
+import hardware
+import pivotpi as pp
+
+def servo(servo, position, time=0.0):
+    """
+    :param servo: Name of the servo (like 's1').
+    :param position: The position of the servo in degrees.
+    :param time: The amount of time in seconds to wait after the step.
+    :return: A servo step of the arms' solution.
+    """
+    return arms.Step(arms.Opcode.SERVO, servo, position=position, time=time)
+
+def registers(angle):
+    """
+    :param angle: The angle of a servo.
+    :return: The bytes of the 4 registers of the servo's channel.
+    """
+    return pp.pwm_bytes(0, pp.angle_to_pwm(angle, pp.PivotPi.servo_min, pp.PivotPi.servo_max))
+
+def test_frames_are_written_over_consecutive_registers():
+    stream = pp.compile_stream([
+        servo('s2', 90),
+        servo('s4', 45, time=0.5),
+        servo('s3', 10, time=0.25),
+        servo('s1', 170),
+        servo('s4', 30, time=0.1)
+    ])
+
+    assert stream == [
+        # s3 isn't known yet, so its registers are kept as they are
+        (1, 0x0a, registers(90) + [None] * 4 + registers(45), 0.5),
+        (2, 0x0e, registers(10), 0.25),
+        # s2 and s3 get the bytes they were last given
+        (0, 0x06, registers(170) + registers(90) + registers(10) + registers(30), 0.1)
+    ]
+
+def test_steps_are_written_one_by_one_without_frames():
+    stream = pp.compile_stream([servo('s2', 90), servo('s4', 45, time=0.5)], frames=False)
+    assert stream == [(1, 0x0a, registers(90), 0.0), (3, 0x12, registers(45), 0.5)]
+
+def test_fractional_angles_and_bad_steps():
+    assert pp.compile_stream([servo('s8', 90.5)]) == [(7, 0x22, registers(90.5), 0.0)]
+
+    with pytest.raises(ValueError):
+        pp.compile_stream([servo('s1', 181)])
+    with pytest.raises(ValueError):
+        pp.compile_stream([arms.Step(arms.Opcode.PHOTO)])
+
+def test_set_frame_writes_the_same_bytes_as_the_stream():
+    pivotpi = hardware.get_pivotpi('sim')
+    assert pivotpi.set_frame({0: 170, 3: 30}) == 1
+    assert pivotpi.set_frame({8: 90}) == -1
+
+    controller = pivotpi.servo_controller
+    for channel, angle in [(0, 170), (3, 30)]:
+        register = pp.PCA9685.LED0_ON_L + 4 * channel
+        assert controller._device.readList(register, 4) == registers(angle)
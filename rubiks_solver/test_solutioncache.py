@@ -0,0 +1,56 @@
+import solutioncache
+
+def test_least_recently_used_state_is_dropped():
+    cache = solutioncache.SolutionCache(capacity=2)
+    cache.put('a', ['U'])
+    cache.put('b', ['R'])
+
+    # looking 'a' up makes 'b' the least recently used one
+    assert cache.get('a') == ['U']
+    cache.put('c', ['F'])
+
+    assert cache.get('b') is None
+    assert cache.get('a') == ['U']
+    assert cache.get('c') == ['F']
+    assert cache.counters() == {'hits': 3, 'misses': 1, 'entries': 2}
+
+def test_stream_is_kept_for_its_setup_only():
+    cache = solutioncache.SolutionCache()
+    cache.put_stream('a', 'setup', [(0, 1)])
+    assert cache.stream('a', 'setup') is None
+
+    cache.put('a', ['U'])
+    cache.put_stream('a', 'setup', [(0, 1)])
+    assert cache.stream('a', 'setup') == [(0, 1)]
+    assert cache.stream('a', 'other setup') is None
+
+    # the same moves keep the stream, different ones drop it
+    cache.put('a', ['U'])
+    assert cache.stream('a', 'setup') == [(0, 1)]
+    cache.put('a', ['R'])
+    assert cache.stream('a', 'setup') is None
+
+def test_save_and_load_round_trip(tmp_path):
+    path = str(tmp_path / 'solutions.json.gz')
+    cache = solutioncache.SolutionCache()
+    cache.put('a', ['U', "R'"])
+    cache.put('b', ['F2'])
+    cache.put_stream('b', 'setup', [(0, 0x06, [1, 2, None, 3], 0.0), (1, 0x0a, [4, 5, 6, 7], 0.5)])
+    cache.get('a')
+    cache.save(path)
+
+    loaded = solutioncache.SolutionCache.load(path)
+    assert list(loaded.entries) == ['b', 'a']
+    assert loaded.get('a') == ['U', "R'"]
+    assert loaded.stream('a', 'setup') is None
+    assert loaded.stream('b', 'setup') == [(0, 0x06, [1, 2, None, 3], 0.0), (1, 0x0a, [4, 5, 6, 7], 0.5)]
+
+    # a smaller cache only keeps the most recently used states
+    assert list(solutioncache.SolutionCache.load(path, capacity=1).entries) == ['a']
+
+def test_load_without_a_valid_file(tmp_path):
+    path = tmp_path / 'solutions.json.gz'
+    assert len(solutioncache.SolutionCache.load(str(path)).entries) == 0
+
+    path.write_bytes(b'not gzipped')
+    assert len(solutioncache.SolutionCache.load(str(path)).entries) == 0
@@ -0,0 +1,104 @@
+import logging
+import cv2
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# size of the kernel of the Gaussian blur the patches get
+KSIZE = 7
+
+class PatchExtractor(object):
+    def __init__(self, xoff, yoff, dim, pad, shape=(360, 480), ksize=KSIZE):
+        """
+        Create an extractor of the color patches of a cube's face for a camera configuration.
+
+        Only the 3x3 Regions-of-Interest are processed: each one is cut out of the image together with the
+        margin the Gaussian blur needs around it, all of them are blurred at once, converted to LAB at once and
+        averaged in a single reduction. That gives the same values as blurring and converting the whole image.
+        The slices and the buffers for the processing are computed/allocated once here.
+
+        :param xoff: Offset in pixels on the X axis.
+        :param yoff: Offset in pixels on the Y axis.
+        :param dim: Dimension of the squared box that sits on top of a label. Measured in pixels.
+        :param pad: Pad distance between squared boxes.
+        :param shape: The (height, width) of the images.
+        :param ksize: Size of the kernel of the Gaussian blur.
+        """
+        self.key = (xoff, yoff, dim, pad, tuple(shape[:2]), ksize)
+        self.dim = dim
+        self.ksize = ksize
+        margin = ksize // 2
+        height, width = shape[:2]
+
+        corners = [(yoff + row * (dim + pad), xoff + col * (dim + pad)) for row in range(3) for col in range(3)]
+        for y, x in corners:
+            if y < 0 or x < 0 or y + dim > height or x + dim > width:
+                raise ValueError('the Regions-of-Interest don\'t fit in an image of {}x{}'.format(width, height))
+
+        # the windows that get blurred: the patches together with their margins
+        self.stacked = all(y >= margin and x >= margin and y + dim + margin <= height and x + dim + margin <= width
+                           for y, x in corners)
+        if self.stacked:
+            # the windows are stacked on top of each other and blurred as one image, since
+            # the margins keep the blur of a patch from reaching into the other windows
+            size = dim + 2 * margin
+            self.windows = [(slice(y - margin, y + dim + margin), slice(x - margin, x + dim + margin)) for y, x in corners]
+            self.windows_shape = (9 * size, size, 3)
+            self.patches = [(slice(idx * size + margin, idx * size + margin + dim), slice(margin, margin + dim))
+                            for idx in range(9)]
+        else:
+            # a window reaches past the image's edges, so the box around all patches gets blurred
+            # instead, which reflects the image at its edges just like blurring the whole image does
+            top = max(0, min(y for y, _ in corners) - margin)
+            left = max(0, min(x for _, x in corners) - margin)
+            bottom = min(height, max(y for y, _ in corners) + dim + margin)
+            right = min(width, max(x for _, x in corners) + dim + margin)
+            self.windows = [(slice(top, bottom), slice(left, right))]
+            self.windows_shape = (bottom - top, right - left, 3)
+            self.patches = [(slice(y - top, y - top + dim), slice(x - left, x - left + dim)) for y, x in corners]
+
+        self.blurred = np.empty(self.windows_shape, dtype=np.uint8)
+        self.rgb = np.empty((9, dim, dim, 3), dtype=np.uint8)
+        self.lab = np.empty((9 * dim, dim, 3), dtype=np.uint8)
+
+    def extract(self, img):
+        """
+        Computes the color patches of an image.
+
+        :param img: RGB image as numpy array.
+        :return: A LAB image as a 3x3x3 numpy array for all 9 labels of a cube's face.
+        """
+        return self.process(self.cut(img))
+
+    def cut(self, img):
+        """
+        Cuts the windows with the patches out of an image, which is all that's needed from it
+        to compute the color patches. It's quick, so the image can be let go of right away.
+
+        :param img: RGB image as numpy array.
+        :return: A numpy array with the windows, to be passed to process.
+        """
+        windows = np.empty(self.windows_shape, dtype=np.uint8)
+        if self.stacked:
+            size = self.windows_shape[1]
+            for idx, window in enumerate(self.windows):
+                windows[idx * size:(idx + 1) * size] = img[window]
+        else:
+            windows[...] = img[self.windows[0]]
+        return windows
+
+    def process(self, windows):
+        """
+        Computes the color patches of the windows that were cut out of an image. It reuses
+        the same buffers, so it has to be called from a single thread at a time.
+
+        :param windows: The numpy array returned by cut.
+        :return: A LAB image as a 3x3x3 numpy array for all 9 labels of a cube's face.
+        """
+        cv2.GaussianBlur(windows, (self.ksize, self.ksize), sigmaX=0.0, dst=self.blurred)
+        for idx, patch in enumerate(self.patches):
+            self.rgb[idx] = self.blurred[patch]
+        cv2.cvtColor(self.rgb.reshape((9 * self.dim, self.dim, 3)), cv2.COLOR_RGB2LAB, dst=self.lab)
+
+        means = self.lab.reshape((9, self.dim * self.dim, 3)).mean(axis=1)
+        return means.astype(np.uint8).reshape((3, 3, 3))